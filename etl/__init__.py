@@ -1,49 +1,156 @@
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 from dagster import (
     ConfigurableIOManager,
     Definitions,
     load_assets_from_modules,
 )
 
+import src.archive
+import src.dataset_storage
+import src.table_writer
+import src.utils
 from . import assets
-
-
-from datetime import datetime as dt
+from .schema_registry import apply_schema
+from .ops.compact_datasets import compact_datasets_job, compact_datasets_schedule
+from .ops.update_archive_index import update_archive_index_job, update_archive_index_schedule
 
 
 class PandasManager(ConfigurableIOManager):
 
     @staticmethod
-    def read_dataframe_from_disk(schema: str, table_name: str) -> pd.DataFrame:
-        return pd.read_parquet(f'data/{schema}/{table_name}.parquet')
+    def create_filter_expression(filters: list[tuple], dataset_schema: pa.Schema) -> pc.Expression:
+        # filters are and-ed (col, op, value) tuples, ex ('Date', '>=', '2023-01-01') or ('County', 'in', ['Harris'])
+        # values are cast to the column type so dates + timestamps can be given as strings, dictionary (category)
+        # columns compare against their value type
+        operators = {
+            '==': lambda x, y: x == y,
+            '!=': lambda x, y: x != y,
+            '<': lambda x, y: x < y,
+            '<=': lambda x, y: x <= y,
+            '>': lambda x, y: x > y,
+            '>=': lambda x, y: x >= y,
+            'in': lambda x, y: x.isin(y),
+            'not in': lambda x, y: ~x.isin(y),
+        }
+
+        expressions = []
+        for col, operator, value in filters:
+            col_type = dataset_schema.field(col).type
+            if pa.types.is_dictionary(col_type):
+                col_type = col_type.value_type
+            if operator in ['in', 'not in']:
+                cast_value = pa.array(value).cast(col_type)
+            else:
+                cast_value = pa.scalar(value).cast(col_type)
+            expressions.append(operators[operator](pc.field(col), cast_value))
+
+        filter_expression = expressions[0]
+        for expression in expressions[1:]:
+            filter_expression = filter_expression & expression
+        return filter_expression
+
+    @classmethod
+    def read_dataframe_from_disk(cls, schema: str, table_name: str, columns: list[str] | None = None,
+                                 filters: list[tuple] | None = None) -> pd.DataFrame:
+        dataset_dir = f'data/{schema}/{table_name}'
+        if src.dataset_storage.is_dataset(dataset_dir):
+            dataset_schema = src.dataset_storage.get_dataset_schema(dataset_dir)
+            filter_expression = None if filters is None else cls.create_filter_expression(filters, dataset_schema)
+            return src.dataset_storage.read_dataset(dataset_dir, columns=columns, filter_expression=filter_expression)
+
+        file_path = f'data/{schema}/{table_name}.parquet'
+        if columns is None and filters is None:
+            return src.utils.load_parquet(file_path)
+
+        # pushed into the parquet reader: unused columns are never decoded, row groups are skipped on their stats
+        dataset = ds.dataset(file_path, format='parquet')
+        filter_expression = None if filters is None else cls.create_filter_expression(filters, dataset.schema)
+        return dataset.to_table(columns=columns, filter=filter_expression).to_pandas(date_as_object=False)
 
     @staticmethod
-    def write_dataframe_to_disk(schema: str, table_name: str, add_archive: bool, dataframe: pd.DataFrame) -> None:
+    def write_dataframe_to_disk(schema: str, table_name: str, add_archive: bool, dataframe: pd.DataFrame,
+                                partitioning: list[str] | None = None, archive_keys: list[str] | None = None,
+                                exports: dict[str, str] | None = None) -> dict:
         base_dir = f'data/{schema}'
         Path(base_dir).mkdir(parents=True, exist_ok=True)
 
+        # base snapshot + daily row level deltas, read back with src.archive.read_as_of
         if add_archive:
-            Path(f'{base_dir}/archive').mkdir(parents=True, exist_ok=True)
-            dataframe.to_parquet(f'{base_dir}/archive/{table_name}_{dt.now().strftime("%Y-%m-%d")}.parquet', index=False)
+            src.archive.write_snapshot(dataframe, f'{base_dir}/archive', table_name, keys=archive_keys)
+
+        # hive partitioned dataset, only new + changed partitions are written
+        if partitioning is not None:
+            return src.dataset_storage.write_dataset(dataframe, f'{base_dir}/{table_name}', partitioning)
 
-        dataframe.to_parquet(f'{base_dir}/{table_name}.parquet', index=False)
+        # converted to arrow once, the parquet + any exports (ex {'csv': 'tableau/post_emergency/rt.csv'}) are written in parallel
+        write_stats = src.table_writer.write_table(
+            dataframe,
+            {'parquet': f'{base_dir}/{table_name}.parquet', **(exports or {})}
+        )
+        return src.table_writer.flatten_write_stats(write_stats)
+
+    @staticmethod
+    def create_table_name(table_name: str, partition_key: str | None = None) -> str:
+        # partitioned assets template their table name, ex {partition}_vitals -> bexar_vitals
+        if partition_key is None:
+            return table_name
+        return table_name.format(partition=partition_key)
 
     def handle_output(self, context, obj: pd.DataFrame) -> None:
-        self.write_dataframe_to_disk(
+        partition_key = context.asset_partition_key if context.has_asset_partitions else None
+        write_stats = self.write_dataframe_to_disk(
             schema=context.metadata['schema'],
-            table_name=context.metadata['table_name'],
+            table_name=self.create_table_name(context.metadata['table_name'], partition_key),
             add_archive=context.metadata['add_archive'],
-            dataframe=obj
+            dataframe=apply_schema(obj, context.metadata['table_name']),
+            partitioning=context.metadata.get('partitioning'),
+            archive_keys=context.metadata.get('archive_keys'),
+            exports=context.metadata.get('exports')
         )
+        # the asset's incremental state only replaces the previous state once its output is on disk
+        src.utils.commit_pending_paths(context.metadata.get('state_paths') or [])
+
+        if write_stats:
+            context.add_output_metadata(write_stats)
 
     def load_input(self, context) -> pd.DataFrame:
         table_name = context.upstream_output.metadata['table_name']
         schema = context.upstream_output.metadata['schema']
-        df = self.read_dataframe_from_disk(schema=schema, table_name=table_name)
-        return df
+
+        # set on the AssetIn, ex AssetIn(key=..., metadata={'columns': [...], 'filters': [('Date', '>=', ...)]})
+        input_metadata = context.metadata or {}
+        columns = input_metadata.get('columns')
+        filters = input_metadata.get('filters')
+
+        if context.has_asset_partitions:
+            df = pd.concat(
+                [
+                    self.read_dataframe_from_disk(
+                        schema=schema,
+                        table_name=self.create_table_name(table_name, x),
+                        columns=columns,
+                        filters=filters
+                    )
+                    for x in context.asset_partition_keys
+                ],
+                axis=0
+            )
+        else:
+            df = self.read_dataframe_from_disk(schema=schema, table_name=table_name, columns=columns, filters=filters)
+
+        # parquet dictionaries come back as categories, but older files + concatenated partitions may not
+        return apply_schema(df, table_name)
 
 
 resources = {"pandas_io_manager": PandasManager()}
-defs = Definitions(assets=load_assets_from_modules([assets]), resources=resources)
+defs = Definitions(
+    assets=load_assets_from_modules([assets]),
+    jobs=[assets.county_dashboard_vitals_job, compact_datasets_job, update_archive_index_job],
+    schedules=[compact_datasets_schedule, update_archive_index_schedule],
+    resources=resources
+)
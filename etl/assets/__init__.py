@@ -6,23 +6,9 @@ from etl.assets.origin.vitals.get_usa_facts import (
     get_usa_facts_vitals
 )
 
-from etl.assets.origin.vitals.get_arcgis_rest import (
-    get_vitals_harris,
-    get_vitals_bexar,
-    get_vitals_travis,
-    get_vitals_randall,
-    get_vitals_potter,
-    get_vitals_denton,
-    get_vitals_nueces
-)
-
-from etl.assets.origin.vitals.get_power_bi import (
-    get_vitals_tarrant,
-    get_vitals_el_paso
-)
-
-from etl.assets.origin.vitals.get_tableau_data import (
-    get_vitals_galveston
+from etl.assets.origin.vitals.county_dashboard_vitals import (
+    county_dashboard_vitals,
+    county_dashboard_vitals_job
 )
 
 from etl.assets.intermediate.vitals.clean_usa_facts import clean_usa_fact_vitals
@@ -68,6 +54,10 @@ from etl.assets.intermediate.wastewater.wastewater_plant_combined import (
    wastewater_plant_combined
 )
 
+from etl.assets.intermediate.wastewater.cdc_wastewater_aggregated import (
+    cdc_wastewater_aggregated
+)
+
 
 from etl.assets.tableau.wastewater import (
     wastewater,
@@ -1,17 +1,19 @@
 from dagster import asset, AssetIn
 import pandas as pd
 import pandera as pa
-from dagster_pandera import pandera_schema_to_dagster_type
 from pandera.typing import Series, DataFrame
 
+from etl.validation import ValidationConfig, create_dagster_type, create_watermark_path, validate_table
+
 
 class VitalsCombined(pa.DataFrameModel):
-    County: Series[pa.String] = pa.Field(description="Texas county name")
+    County: Series[pa.String] = pa.Field(description="Texas county name", coerce=True)
     Date: Series[pa.Date] = pa.Field(description="Date of observation", coerce=True)
     cases_cumulative: Series[pa.Int32] = pa.Field(description="Cumulative number of cases")
     deaths_cumulative: Series[pa.Int32] = pa.Field(description="Cumulative number of deaths")
     cases_daily: Series[pa.Int32] = pa.Field(description="Daily number of cases")
     deaths_daily: Series[pa.Int32] = pa.Field(description="Daily number of deaths")
+    source: Series[pa.String] = pa.Field(description="Source of data", coerce=True)
 
 
 def combine_vitals(vital_list: list) -> pd.DataFrame:
@@ -31,7 +33,9 @@ def combine_vitals(vital_list: list) -> pd.DataFrame:
     metadata={
         "schema": "intermediate/vitals",
         "table_name": "all_county_vitals_combined",
-        "add_archive": False
+        "add_archive": False,
+        "partitioning": ["County", "month"],
+        "state_paths": [create_watermark_path("all_county_vitals_combined")]
     },
     ins={
         'dashboard_combined_vitals':
@@ -43,13 +47,20 @@ def combine_vitals(vital_list: list) -> pd.DataFrame:
                 # key=["vitals", "intermediate", "usa_facts"]
             # )
     },
-    dagster_type=pandera_schema_to_dagster_type(VitalsCombined),
+    dagster_type=create_dagster_type(VitalsCombined),
     io_manager_key="pandas_io_manager"
 )
 def all_county_vitals_combined(
+        context,
+        config: ValidationConfig,
         dashboard_combined_vitals: pd.DataFrame
         # usa_facts_vitals: pd.DataFrame
 ) -> DataFrame[VitalsCombined]:
     # usa_facts not consistent with counts, also doesn't seem to be updated
     combined_df = dashboard_combined_vitals
+
+    validation_stats = validate_table(
+        combined_df, VitalsCombined, "all_county_vitals_combined", full_validation=config.full_validation
+    )
+    context.add_output_metadata(validation_stats)
     return combined_df
@@ -1,12 +1,23 @@
+from pathlib import Path
+
 import pandas as pd
-from dagster import asset
+from dagster import asset, Config
 
 from src.county_vitals.combine_vitals import (
     list_files,
-    load_files,
-    combine_vitals,
-    clean_vitals
+    load_watermarks,
+    write_watermarks,
+    combine_vitals_incremental
 )
+from src.utils import create_pending_path, load_parquet
+
+OUTPUT_PATH = 'data/intermediate/vitals/dashboard_vitals_combined.parquet'
+WATERMARK_PATH = 'data/intermediate/vitals/dashboard_vitals_combined_watermarks.json'
+
+
+class DashboardVitalsConfig(Config):
+    # recompute every county from its full history, ex for backfills
+    full_refresh: bool = False
 
 
 @asset(
@@ -16,31 +27,27 @@ from src.county_vitals.combine_vitals import (
     metadata={
         "schema": "intermediate/vitals",
         "table_name": "dashboard_vitals_combined",
-        "add_archive": True
+        "add_archive": True,
+        # swapped in by the io manager after the output is written, otherwise a failed write after a revision
+        # would leave the watermarks describing rows that were never stored
+        "state_paths": [WATERMARK_PATH]
     },
 
-    non_argument_deps={
-        # arcgis
-        'origin/vitals/bexar',
-        'origin/vitals/harris',
-        'origin/vitals/travis',
-        'origin/vitals/randall',
-        'origin/vitals/potter',
-        'origin/vitals/denton',
-        'origin/vitals/nueces',
-
-        # power bi
-        'origin/vitals/tarrant',
-        'origin/vitals/el_paso',
-
-        # tableau
-        'origin/vitals/galveston',
-    },
+    # arcgis, power bi + tableau dashboards, one partition per county
+    non_argument_deps={'origin/vitals/county_dashboard'},
     io_manager_key="pandas_io_manager"
 )
-def dashboard_vitals_combined() -> pd.DataFrame:
-    county_files = list_files()
-    county_files_combined_raw = load_files(county_files)
-    county_files_combined = combine_vitals(county_files_combined_raw)
-    county_files_clean = clean_vitals(county_files_combined)
+def dashboard_vitals_combined(config: DashboardVitalsConfig) -> pd.DataFrame:
+    county_files = sorted(list_files())
+    existing_df = load_parquet(OUTPUT_PATH) if Path(OUTPUT_PATH).exists() else None
+    watermarks = load_watermarks(WATERMARK_PATH)
+
+    county_files_clean, new_watermarks = combine_vitals_incremental(
+        county_files,
+        existing_df,
+        watermarks,
+        full_refresh=config.full_refresh
+    )
+
+    write_watermarks(new_watermarks, create_pending_path(WATERMARK_PATH))
     return county_files_clean
@@ -4,6 +4,7 @@ from dagster import asset, AssetIn
 from src.get_covid_dshs import (
     combine_with_existing
 )
+from src.utils import load_parquet
 
 
 @asset(
@@ -18,11 +19,15 @@ from src.get_covid_dshs import (
     metadata={
         "schema": "intermediate/vitals",
         "table_name": "state_vitals_combined",
-        "add_archive": True
+        "add_archive": True,
+        "archive_keys": ["Level_Type", "Level", "Date"]
     },
     io_manager_key='pandas_io_manager'
 )
 def combine_state_vitals(new_texas_vitals) -> pd.DataFrame:
-    existing_vitals = pd.read_parquet('data/tableau/state_vitals.parquet')
+    # state_vitals stores Date as date32 (string before the schema registry), both sides are datetime64 so
+    # drop_duplicates matches the same day
+    existing_vitals = load_parquet('data/tableau/state_vitals.parquet').assign(Date=lambda x: pd.to_datetime(x['Date']))
+    new_texas_vitals = new_texas_vitals.assign(Date=lambda x: pd.to_datetime(x['Date']))
     combined_df = combine_with_existing(new_texas_vitals, existing_vitals)
     return combined_df
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pandas as pd
+from dagster import asset, Config
+
+from src.utils import create_pending_path, load_parquet
+from src.wastewater.aggregate_cdc_wastewater import (
+    aggregate_data,
+    aggregate_incremental,
+    diff_aggregates,
+    run_diagnostics,
+    sort_aggregate
+)
+
+INPUT_PATH = 'data/origin/wastewater/cdc_wastewater.parquet'
+OUTPUT_PATH = 'data/intermediate/wastewater/cdc_wastewater_aggregated.parquet'
+HASH_PATH = 'data/intermediate/wastewater/cdc_wastewater_aggregated_hashes.parquet'
+
+
+class CdcAggregationConfig(Config):
+    # re-aggregate every group, ex after a change to the aggregation
+    full_refresh: bool = False
+    # also run the full rebuild + fail when it differs from the incremental result
+    verify: bool = False
+
+
+@asset(
+    name="cdc_wastewater_aggregated",
+    key_prefix=["intermediate", "wastewater"],
+    group_name="intermediate_wastewater",
+    metadata={
+        "schema": "intermediate/wastewater",
+        "table_name": "cdc_wastewater_aggregated",
+        "add_archive": False,
+        # keyed on Level_Type + Level + Date, the County rows match the old County + Date csv
+        "exports": {"csv": "tableau/wastewater/cdc_wastewater_aggregated.csv"},
+        # swapped in by the io manager after OUTPUT_PATH is written, stale hashes would hide dirty groups
+        "state_paths": [HASH_PATH]
+    },
+    # one row per county, the tmc region + the state for each date
+    non_argument_deps={'origin/wastewater/cdc_wastewater'},
+    io_manager_key="pandas_io_manager"
+)
+def cdc_wastewater_aggregated(context, config: CdcAggregationConfig) -> pd.DataFrame:
+    clean_df = load_parquet(INPUT_PATH)
+    is_incremental = not config.full_refresh and Path(OUTPUT_PATH).exists() and Path(HASH_PATH).exists()
+    existing_df = load_parquet(OUTPUT_PATH) if is_incremental else None
+    previous_hashes = load_parquet(HASH_PATH) if is_incremental else None
+
+    aggregated_df, group_hashes, stats = aggregate_incremental(clean_df, existing_df, previous_hashes)
+
+    if config.verify:
+        diff_stats = diff_aggregates(aggregated_df, sort_aggregate(aggregate_data(clean_df)))
+        print(f'incremental vs full rebuild: {diff_stats}')
+        assert sum(diff_stats.values()) == 0, f'incremental aggregate differs from the full rebuild: {diff_stats}'
+        stats = {**stats, **diff_stats}
+
+    run_diagnostics(aggregated_df)
+    group_hashes.to_parquet(create_pending_path(HASH_PATH), index=False)
+    context.add_output_metadata(stats)
+    return aggregated_df
@@ -13,15 +13,14 @@ import pandas as pd
     ins={
         'houston_plant':
             AssetIn(
-                key=["origin", "wastewater", "houston_plant"]
+                key=["origin", "wastewater", "houston_plant"],
+                metadata={"columns": ['County', 'Plant_Name', 'Date', 'viral_load', 'viral_load_log10']}
             ),
     },
 
     io_manager_key="pandas_io_manager"
 )
-def wastewater_plant_combined(houston_plant) -> pd.DataFrame:
-    houston_plant = pd.read_parquet('data/origin/wastewater/houston_plant.parquet')
-
+def wastewater_plant_combined(houston_plant: pd.DataFrame) -> pd.DataFrame:
     cleaned_df = (
         houston_plant
         .assign(source='houston_wastewater_dashboard')
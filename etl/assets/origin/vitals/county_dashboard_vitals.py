@@ -0,0 +1,72 @@
+import pandas as pd
+from dagster import (
+    asset,
+    AssetsDefinition,
+    StaticPartitionsDefinition,
+    define_asset_job,
+)
+
+from etl.assets.origin.vitals.get_arcgis_rest import get_vitals_manager, ARCGIS_CONFIG
+from etl.assets.origin.vitals.get_power_bi import get_vitals as get_power_bi_vitals, POWER_BI_CONFIG
+from etl.assets.origin.vitals.get_tableau_data import get_vitals as get_tableau_vitals, TABLEAU_CONFIG
+
+# each dashboard source: its parsed yaml config + the function that fetches one county config
+# TODO: fix el paso - need to combine individual level vitals
+COUNTY_SOURCES = {
+    'arcgis_rest': (ARCGIS_CONFIG, get_vitals_manager),
+    'power_bi': (POWER_BI_CONFIG, get_power_bi_vitals),
+    'tableau': (TABLEAU_CONFIG, get_tableau_vitals),
+}
+
+
+def create_partition_key(config: dict) -> str:
+    # ex bexar_vitals -> bexar, matches the origin file names
+    return config['out']['table_name'].removesuffix('_vitals')
+
+
+def create_county_configs(sources: dict) -> dict:
+    county_configs = {}
+    for source, (source_config, _) in sources.items():
+        for config in source_config.values():
+            partition_key = create_partition_key(config)
+            assert partition_key not in county_configs, f'{partition_key} is defined by more than one source'
+            county_configs[partition_key] = (source, config)
+
+    return county_configs
+
+
+def build_county_vitals_asset(sources: dict) -> tuple[AssetsDefinition, StaticPartitionsDefinition]:
+    # one partition per yaml block, so adding a county only means adding its config
+    county_configs = create_county_configs(sources)
+    partitions_def = StaticPartitionsDefinition(sorted(county_configs.keys()))
+
+    @asset(
+        name="county_dashboard",
+        group_name="origin_vitals",
+        key_prefix=['origin', 'vitals'],
+        partitions_def=partitions_def,
+        metadata={
+            "schema": "origin/vitals",
+            "table_name": "{partition}_vitals",
+            "add_archive": True
+        },
+        io_manager_key='pandas_io_manager'
+    )
+    def county_dashboard_vitals(context) -> pd.DataFrame:
+        source, config = county_configs[context.partition_key]
+        _, get_vitals = sources[source]
+
+        context.log.info(f'Fetching {context.partition_key} from {source}')
+        return get_vitals(config)
+
+    return county_dashboard_vitals, partitions_def
+
+
+county_dashboard_vitals, COUNTY_PARTITIONS = build_county_vitals_asset(COUNTY_SOURCES)
+
+# a backfill over this job launches one run per county, so counties are fetched concurrently
+county_dashboard_vitals_job = define_asset_job(
+    name='county_dashboard_vitals_job',
+    selection=[county_dashboard_vitals],
+    partitions_def=COUNTY_PARTITIONS
+)
@@ -3,7 +3,6 @@ from pathlib import Path
 
 import pandas as pd
 import yaml
-from dagster import asset
 
 from src.county_vitals.arcgis_rest.get_arcgis_rest import (
     parse_data_manager,
@@ -34,107 +33,3 @@ def get_vitals_manager(config: dict) -> pd.DataFrame:
 
 ARCGIS_CONFIG = yaml.safe_load(Path('src/county_vitals/arcgis_rest/arcgis_rest_vitals.yaml').read_text())
 
-
-@asset(
-    name="harris",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "harris_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_harris(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['harris'])
-
-
-@asset(
-    name="travis",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "travis_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_travis(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['travis'])
-
-
-@asset(
-    name="bexar",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "bexar_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_bexar(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['bexar'])
-
-
-@asset(
-    name="randall",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "randall_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_randall(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['randall'])
-
-
-@asset(
-    name="potter",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "potter_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_potter(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['potter'])
-
-
-@asset(
-    name="denton",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "denton_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_denton(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['denton'])
-
-
-@asset(
-    name="nueces",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "nueces_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_nueces(context) -> pd.DataFrame:
-    return get_vitals_manager(ARCGIS_CONFIG['nueces'])
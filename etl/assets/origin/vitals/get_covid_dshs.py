@@ -18,7 +18,8 @@ from src.get_covid_dshs import (
     metadata={
         "schema": "origin/vitals_state",
         "table_name": "new_texas_vitals",
-        "add_archive": True
+        "add_archive": True,
+        "archive_keys": ["Level_Type", "Level", "Date"]
     },
     io_manager_key='pandas_io_manager'
 )
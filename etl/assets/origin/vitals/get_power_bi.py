@@ -4,7 +4,6 @@ import pandas as pd
 import yaml
 
 from src.county_vitals.request_common import clean_request_data
-from dagster import asset
 
 from src.county_vitals.power_bi.get_power_bi import (
     parse_response,
@@ -23,32 +22,3 @@ def get_vitals(config) -> pd.DataFrame:
 
 POWER_BI_CONFIG = yaml.safe_load(Path('src/county_vitals/power_bi/power_bi_config.yaml').read_text())
 
-
-@asset(
-    name="tarrant",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "tarrant_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_tarrant() -> pd.DataFrame:
-    return get_vitals(POWER_BI_CONFIG['tarrant'])
-
-# TODO: fix el paso - need to combine individual level vitals
-@asset(
-    name="el_paso",
-    group_name="origin_vitals",
-    key_prefix=['origin', 'vitals'],
-    metadata={
-        "schema": "origin/vitals",
-        "table_name": "el_paso_vitals",
-        "add_archive": True
-    },
-    io_manager_key='pandas_io_manager'
-)
-def get_vitals_el_paso() -> pd.DataFrame:
-    return get_vitals(POWER_BI_CONFIG['el paso'])
@@ -16,13 +16,14 @@ USA_FACTS_CONFIG = yaml.safe_load(Path('src/county_vitals/usa_facts/usa_facts_co
     metadata={
         "schema": "origin/vitals/other_sources",
         "table_name": "usa_facts_vitals",
-        "add_archive": True
+        "add_archive": True,
+        "archive_keys": ["county", "date"]
     },
     io_manager_key='pandas_io_manager'
 )
 def get_usa_facts_vitals() -> pd.DataFrame:
-    results = [get_vitals(USA_FACTS_CONFIG[x]) for x in ['cases', 'deaths']]
-    final_df = combine_vitals(results)
+    vitals_tables = {x: get_vitals(USA_FACTS_CONFIG[x]) for x in ['cases', 'deaths']}
+    final_df = combine_vitals(vitals_tables)
 
     # TODO: add newness check, only write if new
 
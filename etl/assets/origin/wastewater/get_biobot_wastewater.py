@@ -1,12 +1,26 @@
+from pathlib import Path
+
 import pandas as pd
-from dagster import asset
+from dagster import asset, Config
 
+from src.utils import create_pending_path, load_parquet
 from src.wastewater.get_biobot_wastewater import (
-    obtain_urls,
-    clean_data
-
+    MANIFEST_PATH,
+    load_manifest,
+    write_manifest,
+    get_new_reports,
+    get_last_ingested_date,
+    combine_reports
 )
 
+OUTPUT_PATH = 'data/origin/wastewater/biobot_wastewater.parquet'
+
+
+class BiobotConfig(Config):
+    # weekly reports to look back over, ex 200 for a full backfill, reports in the manifest aren't fetched again
+    num_reports: int = 1
+
+
 @asset(
     name="biobot_wastewater",
     group_name="origin_wastewater",
@@ -14,12 +28,20 @@ from src.wastewater.get_biobot_wastewater import (
     metadata={
         "schema": "origin/wastewater",
         "table_name": "biobot_wastewater",
-        "add_archive": True
+        "add_archive": True,
+        # swapped in by the io manager after the output is written, otherwise a failed write would mark reports
+        # as ingested that never made it into the table
+        "state_paths": [MANIFEST_PATH]
     },
     io_manager_key='pandas_io_manager'
 )
-def get_biobot_wastewater() -> pd.DataFrame:
-    wastewater_run_data = obtain_urls(1)
-    raw_data = [pd.read_csv(filepath_or_buffer=i, skiprows=1) for i in wastewater_run_data['urls']]
-    cleaned_biobot_data = pd.concat([clean_data(i) for i in raw_data]).drop_duplicates()
+def get_biobot_wastewater(config: BiobotConfig) -> pd.DataFrame:
+    manifest = load_manifest()
+    new_reports, new_manifest = get_new_reports(config.num_reports, manifest)
+
+    existing_df = load_parquet(OUTPUT_PATH) if Path(OUTPUT_PATH).exists() else None
+    assert new_reports or existing_df is not None, 'No biobot reports found'
+
+    cleaned_biobot_data = combine_reports(existing_df, new_reports, get_last_ingested_date(manifest))
+    write_manifest(new_manifest, create_pending_path(MANIFEST_PATH))
     return cleaned_biobot_data
@@ -2,9 +2,8 @@ import pandas as pd
 from dagster import asset
 
 from src.wastewater.get_cdc_wastewater import (
-    create_client,
-    create_offsets,
-    get_data,
+    DATASET_ID,
+    get_new_data,
     clean_data
 )
 
@@ -23,17 +22,13 @@ metadata={
     io_manager_key='pandas_io_manager'
 )
 def get_cdc_wastewater() -> pd.DataFrame:
-    DATASET_ID = "2ew6-ywp6"
-    client = create_client()
-
     # TODO: update path
     current_df = load_csv('tableau/wastewater/cdc_wastewater.csv')
     current_max_date = current_df['Date'].max()
 
     # region pull data --------------------------------------------------------------------------------
-    offsets = create_offsets(client, DATASET_ID, current_max_date)
-    results = [get_data(client, offset, DATASET_ID, current_max_date) for offset in offsets]
-    results_df = pd.concat([pd.DataFrame.from_records(i) for i in results])
+    results_df = get_new_data(DATASET_ID, current_max_date)
+    assert results_df is not None, f'No new records found after {current_max_date}'
     # endregion
 
     # region clean_data --------------------------------------------------------------------------------
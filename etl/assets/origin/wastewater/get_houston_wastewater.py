@@ -16,7 +16,8 @@ from src.wastewater.get_houston_zip_wastewater import (
     metadata={
         "schema": "origin/wastewater",
         "table_name": "houston_plant",
-        "add_archive": True
+        "add_archive": True,
+        "archive_keys": ["County", "Plant_Name", "Date"]
     },
     io_manager_key='pandas_io_manager'
 )
@@ -31,7 +32,8 @@ def get_houston_wastewater_plant() -> pd.DataFrame:
     metadata={
         "schema": "origin/wastewater",
         "table_name": "houston_zip",
-        "add_archive": True
+        "add_archive": True,
+        "archive_keys": ["zipcode", "Date"]
     },
     io_manager_key='pandas_io_manager'
 )
@@ -1,14 +1,14 @@
 from dagster import asset, AssetIn
 import pandas as pd
 import pandera as pa
-from dagster_pandera import pandera_schema_to_dagster_type
 from pandera.typing import Series, DataFrame
-from src.utils import write_file
+
+from etl.validation import ValidationConfig, create_dagster_type, create_watermark_path, validate_table
 
 
 class RtFinal(pa.DataFrameModel):
-    Level_Type: Series[pa.String] = pa.Field(description="Group descriptor - as of now just county")
-    Level: Series[pa.String] = pa.Field(description="Actual level (ex Harris County)")
+    Level_Type: Series[pa.String] = pa.Field(description="Group descriptor - as of now just county", coerce=True)
+    Level: Series[pa.String] = pa.Field(description="Actual level (ex Harris County)", coerce=True)
     Date: Series[pa.Date] = pa.Field(description="Date of observation", coerce=True)
     Rt: Series[pa.Float32] = pa.Field(description="Rt estimate")
     lower: Series[pa.Float32] = pa.Field(description="Lower bound of confidence interval")
@@ -43,7 +43,9 @@ def clean_rt(df: pd.DataFrame) -> pd.DataFrame:
     metadata={
         "schema": "tableau",
         "table_name": "rt",
-        "add_archive": False
+        "add_archive": False,
+        "exports": {"csv": "tableau/post_emergency/rt.csv"},
+        "state_paths": [create_watermark_path("rt")]
     },
     ins={
         'rt_raw':
@@ -51,16 +53,12 @@ def clean_rt(df: pd.DataFrame) -> pd.DataFrame:
                 key=["intermediate", "rt", "rt_all"]
             )
     },
-    dagster_type=pandera_schema_to_dagster_type(RtFinal),
+    dagster_type=create_dagster_type(RtFinal),
     io_manager_key="pandas_io_manager"
 )
-def rt(rt_raw: pd.DataFrame) -> DataFrame[RtFinal]:
+def rt(context, config: ValidationConfig, rt_raw: pd.DataFrame) -> DataFrame[RtFinal]:
     rt_clean = clean_rt(rt_raw)
-    try:
-        RtFinal.validate(rt_clean)
-    except pa.errors.SchemaErrors as err:
-        print(err.failure_cases)
-        raise err
+    validation_stats = validate_table(rt_clean, RtFinal, "rt", full_validation=config.full_validation)
+    context.add_output_metadata(validation_stats)
 
-    write_file(rt_clean, "tableau/post_emergency/rt", add_date=False)
     return rt_clean
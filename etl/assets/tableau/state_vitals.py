@@ -1,15 +1,15 @@
 from dagster import asset, AssetIn
 import pandas as pd
 import pandera as pa
-from dagster_pandera import pandera_schema_to_dagster_type
 from pandera.typing import Series, DataFrame
-from src.utils import write_file
+
+from etl.validation import ValidationConfig, create_dagster_type, create_watermark_path, validate_table
 
 
 class StateVitals(pa.DataFrameModel):
     Date: Series[pa.Date] = pa.Field(description="Date of observation", coerce=True)
-    Level_Type: Series[pa.String] = pa.Field(description="Level of observation (ex State)")
-    Level: Series[pa.String] = pa.Field(description="Level of observation (ex Texas)")
+    Level_Type: Series[pa.String] = pa.Field(description="Level of observation (ex State)", coerce=True)
+    Level: Series[pa.String] = pa.Field(description="Level of observation (ex Texas)", coerce=True)
     new_cases_probable_plus_confirmed: Series[pa.Int32] = pa.Field(
         description="New cases probable plus confirmed",
         ge=0
@@ -42,12 +42,14 @@ class StateVitals(pa.DataFrameModel):
     metadata={
         "schema": "tableau",
         "table_name": "state_vitals",
-        "add_archive": False
+        "add_archive": False,
+        "exports": {"csv": "tableau/post_emergency/state_vitals.csv"},
+        "state_paths": [create_watermark_path("state_vitals")]
     },
-    dagster_type=pandera_schema_to_dagster_type(StateVitals),
+    dagster_type=create_dagster_type(StateVitals),
     io_manager_key='pandas_io_manager'
 )
-def state_vitals(state_vitals_combined: pd.DataFrame) -> DataFrame[StateVitals]:
+def state_vitals(context, config: ValidationConfig, state_vitals_combined: pd.DataFrame) -> DataFrame[StateVitals]:
     state_vitals = state_vitals_combined
     state_vitals = (
         state_vitals
@@ -65,11 +67,7 @@ def state_vitals(state_vitals_combined: pd.DataFrame) -> DataFrame[StateVitals]:
             }
         )
     )
-    try:
-        StateVitals.validate(state_vitals)
-    except pa.errors.SchemaErrors as err:
-        print(err.failure_cases)
-        raise err
+    validation_stats = validate_table(state_vitals, StateVitals, "state_vitals", full_validation=config.full_validation)
+    context.add_output_metadata(validation_stats)
 
-    write_file(state_vitals, "tableau/post_emergency/state_vitals", add_date=False)
     return state_vitals
@@ -1,16 +1,16 @@
 from dagster import asset, AssetIn
 import pandas as pd
 import pandera as pa
-from dagster_pandera import pandera_schema_to_dagster_type
 from pandera.typing import Series, DataFrame
-from src.utils import write_file
+
+from etl.validation import ValidationConfig, create_dagster_type, create_watermark_path, validate_table
 
 
 class WastewaterFinal(pa.DataFrameModel):
-    County: Series[pa.String] = pa.Field(description="County")
+    County: Series[pa.String] = pa.Field(description="County", coerce=True)
     Date: Series[pa.Date] = pa.Field(description="Date of observation", coerce=True)
     viral_load: Series[pa.Float32] = pa.Field(description="Viral load estimate", nullable=True, coerce=True)
-    source: Series[pa.String] = pa.Field(description="Source of data")
+    source: Series[pa.String] = pa.Field(description="Source of data", coerce=True)
 
     class Config:
         unique = ["County", "Date"]
@@ -23,7 +23,9 @@ class WastewaterFinal(pa.DataFrameModel):
     metadata={
         "schema": "tableau",
         "table_name": "wastewater",
-        "add_archive": False
+        "add_archive": False,
+        "exports": {"csv": "tableau/post_emergency/wastewater.csv"},
+        "state_paths": [create_watermark_path("wastewater")]
     },
     ins={
         'combined_wastewater':
@@ -31,15 +33,13 @@ class WastewaterFinal(pa.DataFrameModel):
                 key=["intermediate", "wastewater", "wastewater_combined"]
             )
     },
-    dagster_type=pandera_schema_to_dagster_type(WastewaterFinal),
+    dagster_type=create_dagster_type(WastewaterFinal),
     io_manager_key="pandas_io_manager"
 )
-def wastewater(combined_wastewater: pd.DataFrame) -> DataFrame[WastewaterFinal]:
-    try:
-        WastewaterFinal.validate(combined_wastewater)
-    except pa.errors.SchemaErrors as err:
-        print(err.failure_cases)
-        raise err
+def wastewater(context, config: ValidationConfig, combined_wastewater: pd.DataFrame) -> DataFrame[WastewaterFinal]:
+    validation_stats = validate_table(
+        combined_wastewater, WastewaterFinal, "wastewater", full_validation=config.full_validation
+    )
+    context.add_output_metadata(validation_stats)
 
-    write_file(combined_wastewater, "tableau/post_emergency/wastewater", add_date=False)
     return combined_wastewater
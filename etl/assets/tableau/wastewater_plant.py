@@ -1,18 +1,18 @@
 from dagster import asset, AssetIn
 import pandas as pd
 import pandera as pa
-from dagster_pandera import pandera_schema_to_dagster_type
 from pandera.typing import Series, DataFrame
-from src.utils import write_file
+
+from etl.validation import ValidationConfig, create_dagster_type, create_watermark_path, validate_table
 
 
 class WastewaterPlantFinal(pa.DataFrameModel):
-    County: Series[pa.String] = pa.Field(description="County")
-    Plant_Name: Series[pa.String] = pa.Field(description="Plant Name")
+    County: Series[pa.String] = pa.Field(description="County", coerce=True)
+    Plant_Name: Series[pa.String] = pa.Field(description="Plant Name", coerce=True)
     Date: Series[pa.Date] = pa.Field(description="Date of observation", coerce=True)
     viral_load: Series[pa.Float32] = pa.Field(description="Viral load estimate", nullable=True, coerce=True)
     viral_load_log10: Series[pa.Float32] = pa.Field(description="Viral load estimate (log10)", nullable=True, coerce=True)
-    source: Series[pa.String] = pa.Field(description="Source of data")
+    source: Series[pa.String] = pa.Field(description="Source of data", coerce=True)
 
     class Config:
         unique = ["County", "Plant_Name", "Date"]
@@ -25,7 +25,9 @@ class WastewaterPlantFinal(pa.DataFrameModel):
     metadata={
         "schema": "tableau",
         "table_name": "wastewater_plant",
-        "add_archive": False
+        "add_archive": False,
+        "exports": {"csv": "tableau/post_emergency/wastewater_plant.csv"},
+        "state_paths": [create_watermark_path("wastewater_plant")]
     },
     ins={
         'wastewater_plant_combined':
@@ -33,15 +35,17 @@ class WastewaterPlantFinal(pa.DataFrameModel):
                 key=["intermediate", "wastewater", "wastewater_plant_combined"]
             )
     },
-    dagster_type=pandera_schema_to_dagster_type(WastewaterPlantFinal),
+    dagster_type=create_dagster_type(WastewaterPlantFinal),
     io_manager_key="pandas_io_manager"
 )
-def wastewater_plant(wastewater_plant_combined: pd.DataFrame) -> DataFrame[WastewaterPlantFinal]:
-    try:
-        WastewaterPlantFinal.validate(wastewater_plant_combined)
-    except pa.errors.SchemaErrors as err:
-        print(err.failure_cases)
-        raise err
+def wastewater_plant(
+        context,
+        config: ValidationConfig,
+        wastewater_plant_combined: pd.DataFrame
+) -> DataFrame[WastewaterPlantFinal]:
+    validation_stats = validate_table(
+        wastewater_plant_combined, WastewaterPlantFinal, "wastewater_plant", full_validation=config.full_validation
+    )
+    context.add_output_metadata(validation_stats)
 
-    write_file(wastewater_plant_combined, "tableau/post_emergency/wastewater_plant", add_date=False)
     return wastewater_plant_combined
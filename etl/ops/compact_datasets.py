@@ -0,0 +1,25 @@
+from dagster import op, job, ScheduleDefinition
+
+import src.dataset_storage
+
+
+@op(
+    name="compact_datasets",
+    description="Merges the delta files appended to each hive partitioned table back into one file per partition",
+)
+def compact_datasets(context) -> None:
+    compaction_stats = src.dataset_storage.compact_datasets('data')
+    for base_dir, stats in compaction_stats.items():
+        context.log.info(f'{base_dir}: {stats}')
+
+
+@job(name="compact_datasets_job")
+def compact_datasets_job():
+    compact_datasets()
+
+
+# runs outside of the materialization jobs so writers only ever append
+compact_datasets_schedule = ScheduleDefinition(
+    job=compact_datasets_job,
+    cron_schedule="0 3 * * *",
+)
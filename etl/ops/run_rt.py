@@ -1,9 +1,13 @@
-import os
-
 import pandas as pd
-from dagster import asset, op, AssetIn
+from dagster import asset, op, AssetIn, Config
+
+from src.rt.compute_rt import clean_county_vitals, calculate_rt_incremental, RT_WINDOW_DAYS, RT_INPUT_COLS
 
-from src.utils import run_r_script
+
+class RtConfig(Config):
+    # re-estimate every level over its full history instead of the trailing window
+    full_refresh: bool = False
+    window_days: int = RT_WINDOW_DAYS
 
 
 # @op(
@@ -27,22 +31,19 @@ from src.utils import run_r_script
         "table_name": "rt_all",
         "add_archive": False
     },
-    non_argument_deps={'vitals/county_vitals'},
+    ins={
+        'county_vitals':
+            AssetIn(
+                key=["vitals", "county_vitals"],
+                metadata={"columns": RT_INPUT_COLS}
+            )
+    },
     io_manager_key="pandas_io_manager"
 )
-def compute_rt() -> pd.DataFrame:
-    config = {
-        'script_path': "src/rt/compute_rt.r",
-        'arg': "--vanilla",
-        'input_file': "data/tableau/county_vitals.parquet",
-        'output_file': "data/temp/rt_all.parquet"
-    }
-
-    success = run_r_script(config)
-
-    if not success:
-        raise Exception("R script failed to run")
-
-    rt_results = pd.read_parquet(config['output_file'])
-    os.remove(config['output_file'])
+def compute_rt(config: RtConfig, county_vitals: pd.DataFrame) -> pd.DataFrame:
+    rt_results = calculate_rt_incremental(
+        clean_county_vitals(county_vitals),
+        window_days=config.window_days,
+        full_refresh=config.full_refresh
+    )
     return rt_results
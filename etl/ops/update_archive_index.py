@@ -0,0 +1,24 @@
+from dagster import op, job, ScheduleDefinition
+
+import src.archive_index
+
+
+@op(
+    name="update_archive_index",
+    description="Adds newly archived snapshots to the archive index used for revision history queries",
+)
+def update_archive_index(context) -> None:
+    index, stats = src.archive_index.update_index('data', src.archive_index.INDEX_PATH)
+    context.log.info(f'{len(index["archives"])} archive dirs: {stats}')
+
+
+@job(name="update_archive_index_job")
+def update_archive_index_job():
+    update_archive_index()
+
+
+# only new or modified snapshot files are opened, so a daily run is cheap
+update_archive_index_schedule = ScheduleDefinition(
+    job=update_archive_index_job,
+    cron_schedule="30 3 * * *",
+)
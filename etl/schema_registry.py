@@ -0,0 +1,61 @@
+import pandas as pd
+import pandera as pa
+
+from etl.assets.intermediate.vitals.combine_all_vitals import VitalsCombined
+from etl.assets.tableau.county_vitals import CountyVitals
+from etl.assets.tableau.rt import RtFinal
+from etl.assets.tableau.state_vitals import StateVitals
+from etl.assets.tableau.wastewater import WastewaterFinal
+from etl.assets.tableau.wastewater_plant import WastewaterPlantFinal
+
+# pandas dtypes the io manager applies on write + read, derived from the pandera models so the two can't drift
+# strings (county, source, level, plant names) repeat on every row -> category, stored as parquet dictionaries
+# dates -> datetime64, stored as date32 by src.table_writer
+# ints keep the model's width as nullable ints, since daily metrics can be missing
+# floats aren't cast, they keep the width the asset produced: a Float32 annotation is only validated, narrowing
+# ex a viral load of 5190013410195.789 would lose digits in the published files
+SCHEMA_MODELS: dict[str, type[pa.DataFrameModel]] = {
+    'all_county_vitals_combined': VitalsCombined,
+    'county_vitals': CountyVitals,
+    'rt': RtFinal,
+    'state_vitals': StateVitals,
+    'wastewater': WastewaterFinal,
+    'wastewater_plant': WastewaterPlantFinal,
+}
+
+PANDERA_DTYPES = {
+    'str': 'category',
+    'date': 'datetime64[ns]',
+}
+
+
+def create_pandas_dtype(pandera_dtype: str) -> str | None:
+    if pandera_dtype in PANDERA_DTYPES:
+        return PANDERA_DTYPES[pandera_dtype]
+    if pandera_dtype.startswith('int'):
+        return pandera_dtype.capitalize()
+    if pandera_dtype.startswith('float'):
+        return None
+    return pandera_dtype
+
+
+def create_table_dtypes(model: type[pa.DataFrameModel]) -> dict[str, str]:
+    pandas_dtypes = {name: create_pandas_dtype(str(col.dtype)) for name, col in model.to_schema().columns.items()}
+    return {name: dtype for name, dtype in pandas_dtypes.items() if dtype is not None}
+
+
+TABLE_DTYPES = {table_name: create_table_dtypes(model) for table_name, model in SCHEMA_MODELS.items()}
+
+
+def apply_schema(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    table_dtypes = TABLE_DTYPES.get(table_name)
+    if table_dtypes is None:
+        return df
+
+    # reads can be projected, so only the columns present are cast
+    typed_df = df.astype({col: dtype for col, dtype in table_dtypes.items() if col in df.columns})
+
+    # filtered frames keep every category of their source, ex el paso after County != 'El Paso'
+    category_cols = [col for col in typed_df.columns if isinstance(typed_df[col].dtype, pd.CategoricalDtype)]
+    return typed_df.assign(**{col: typed_df[col].cat.remove_unused_categories() for col in category_cols})
+
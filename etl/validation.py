@@ -0,0 +1,130 @@
+import time
+
+import pandas as pd
+import pandera as pa
+from dagster import Config, DagsterType
+from dagster_pandera import pandera_schema_to_dagster_type
+
+from src.county_vitals.combine_vitals import load_watermarks, write_watermarks
+from src.utils import create_pending_path
+
+# each table is validated once per materialization, by validate_table in the asset body
+# incremental runs only validate the rows dated after each group's last validated date
+# history is fully validated once a week
+# one watermark file per table, so tables materialized in parallel processes never rewrite each other's file
+WATERMARK_DIR = 'data/validation_watermarks'
+FULL_VALIDATION_DAYS = 7
+DATE_COL = 'Date'
+
+
+class ValidationConfig(Config):
+    # validate every row instead of the rows after the watermark, ex after a historical revision
+    full_validation: bool = False
+
+
+def create_watermark_path(table_name: str, watermark_dir: str = WATERMARK_DIR) -> str:
+    # ex the asset's metadata={'state_paths': [create_watermark_path('county_vitals')]}
+    return f'{watermark_dir}/{table_name}.json'
+
+
+def create_dagster_type(model: type[pa.DataFrameModel]) -> DagsterType:
+    # keeps the column schema + descriptions in the dagster ui without a second pandera validation on output
+    pandera_type = pandera_schema_to_dagster_type(model)
+    return DagsterType(
+        type_check_fn=lambda _, value: isinstance(value, pd.DataFrame),
+        name=pandera_type.unique_name,
+        description=pandera_type.description,
+        metadata=pandera_type.metadata,
+        typing_type=pd.DataFrame
+    )
+
+
+def is_increasing_within(df: pd.DataFrame, group_col: str, value_col: str) -> pd.Series:
+    # one vectorized diff in row order instead of a python loop over each group's series
+    # the first row of a group has nothing to compare against
+    return df.groupby(group_col, observed=True, sort=False)[value_col].diff().fillna(0).ge(0)
+
+
+def get_group_cols(model: type[pa.DataFrameModel]) -> list[str]:
+    return [col for col in getattr(model.Config, 'unique', None) or [] if col != DATE_COL]
+
+
+def create_group_watermarks(df: pd.DataFrame, group_cols: list[str]) -> list[dict]:
+    # one watermark per group, counties + plants report on their own schedules so a late county
+    # still has rows after its own last date when another county is already ahead
+    dates = pd.to_datetime(df[DATE_COL])
+    if not group_cols:
+        return [{DATE_COL: dates.max().strftime('%Y-%m-%d')}]
+
+    last_dates = dates.groupby([df[col] for col in group_cols], observed=True).max().reset_index()
+    return (
+        last_dates
+        .astype({col: str for col in group_cols})
+        .assign(**{DATE_COL: lambda x: x[DATE_COL].dt.strftime('%Y-%m-%d')})
+        .to_dict(orient='records')
+    )
+
+
+def select_new_rows(df: pd.DataFrame, group_watermarks: list[dict], group_cols: list[str]) -> pd.DataFrame:
+    watermark_df = pd.DataFrame(group_watermarks, columns=group_cols + [DATE_COL])
+    if group_cols:
+        row_watermarks = (
+            df[group_cols].astype(str)
+            .merge(watermark_df, how='left', on=group_cols)
+            [DATE_COL].pipe(pd.to_datetime).to_numpy()
+        )
+    else:
+        row_watermarks = pd.to_datetime(watermark_df[DATE_COL]).max()
+
+    # groups without a watermark are new, and the last already validated row of each group is kept
+    # so increasing checks compare across the watermark
+    is_new = ~(pd.to_datetime(df[DATE_COL]).to_numpy() <= row_watermarks)
+    previous_df = df[~is_new]
+    if group_cols:
+        boundary_index = previous_df.groupby(group_cols, observed=True, sort=False).tail(1).index
+    else:
+        boundary_index = previous_df.tail(1).index
+    return df[is_new | df.index.isin(boundary_index)]
+
+
+def is_full_validation(table_watermark: dict | None, full_validation: bool) -> bool:
+    if full_validation or table_watermark is None:
+        return True
+    days_since_full = (pd.Timestamp.today().normalize() - pd.Timestamp(table_watermark['full_validated'])).days
+    return days_since_full >= FULL_VALIDATION_DAYS
+
+
+def validate_table(df: pd.DataFrame, model: type[pa.DataFrameModel], table_name: str,
+                   full_validation: bool = False, watermark_dir: str = WATERMARK_DIR) -> dict:
+    # returns the validation stats for the asset's output metadata
+    # the new watermark is staged as pending, the io manager swaps it in once the table is written
+    watermark_path = create_watermark_path(table_name, watermark_dir)
+    table_watermark = load_watermarks(watermark_path) or None
+    is_full = is_full_validation(table_watermark, full_validation) or DATE_COL not in df.columns
+
+    if is_full:
+        validate_df = df
+    else:
+        validate_df = select_new_rows(df, table_watermark['watermarks'], get_group_cols(model))
+
+    start = time.perf_counter()
+    try:
+        model.validate(validate_df, lazy=True)
+    except pa.errors.SchemaErrors as err:
+        print(err.failure_cases)
+        raise err
+    validation_seconds = time.perf_counter() - start
+
+    if DATE_COL in df.columns and df.shape[0] > 0:
+        today = pd.Timestamp.today().strftime('%Y-%m-%d')
+        table_watermark = {
+            'watermarks': create_group_watermarks(df, get_group_cols(model)),
+            'full_validated': today if is_full else table_watermark['full_validated']
+        }
+        write_watermarks(table_watermark, create_pending_path(watermark_path))
+
+    return {
+        'validation_mode': 'full' if is_full else 'incremental',
+        'validated_rows': validate_df.shape[0],
+        'validation_seconds': validation_seconds
+    }
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from src.utils import TMC_COUNTIES
+
+# weighted means for any number of metrics over any number of geographic levels in one pass
+# every row is expanded once per level it belongs to (ex Harris -> County Harris, TMC, State Texas), the
+# weighted values + weights of every metric are then summed in one reduction over a sorted (level, date) key
+LEVEL_COLS = ['Level_Type', 'Level']
+
+
+def create_texas_levels(county: pd.Series) -> dict[str, pd.Series]:
+    # level type -> the level each row rolls up to, rows outside a level are null
+    return {
+        'County': county,
+        'TMC': pd.Series(np.where(county.isin(TMC_COUNTIES), 'TMC', None), index=county.index),
+        'State': pd.Series('Texas', index=county.index),
+    }
+
+
+def expand_levels(levels: dict[str, pd.Series]) -> tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    # (row position, level code) for every row + level it belongs to, with the label of each level code
+    row_positions, level_codes, level_labels = [], [], []
+    for level_type, level_values in levels.items():
+        codes, uniques = pd.factorize(level_values, sort=True)
+        is_member = codes >= 0
+        row_positions.append(np.flatnonzero(is_member))
+        level_codes.append(codes[is_member] + len(level_labels))
+        level_labels.extend((level_type, x) for x in uniques)
+
+    return (
+        np.concatenate(row_positions),
+        np.concatenate(level_codes).astype(np.int64),
+        pd.DataFrame(level_labels, columns=LEVEL_COLS)
+    )
+
+
+def weighted_means(df: pd.DataFrame, metrics: list[str], weight_col: str, levels: dict[str, pd.Series],
+                   date_col: str = 'Date') -> pd.DataFrame:
+    # sum(value * weight) / sum(weight) per level + date, a row only weighs in on the metrics it has a value for
+    # df isn't modified, ex weighted_means(df, ['viral_load'], 'population_served', create_texas_levels(df['County']))
+    assert df[date_col].notnull().all(), f'null {date_col} values'
+    if df.shape[0] == 0:
+        return pd.DataFrame(columns=LEVEL_COLS + [date_col] + metrics)
+
+    values = df[metrics].to_numpy(dtype='float64', na_value=np.nan)
+    weights = df[weight_col].to_numpy(dtype='float64', na_value=np.nan)[:, None]
+    is_valid = ~np.isnan(values) & ~np.isnan(weights)
+
+    # numerators + denominators side by side, so both are summed in the same reduction
+    weighted_values = np.hstack([np.where(is_valid, values * weights, 0), np.where(is_valid, weights, 0)])
+
+    date_codes, dates = pd.factorize(df[date_col], sort=True)
+    row_positions, level_codes, level_labels = expand_levels(levels)
+    keys = level_codes * len(dates) + date_codes[row_positions]
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sums = np.add.reduceat(weighted_values[row_positions[order]], group_starts, axis=0)
+
+    # a level + date with no values for a metric is null, same as a groupby sum / sum
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums[:, :len(metrics)] / sums[:, len(metrics):]
+
+    group_keys = sorted_keys[group_starts]
+    return pd.concat(
+        [
+            level_labels.iloc[group_keys // len(dates)].reset_index(drop=True),
+            pd.DataFrame({date_col: dates[group_keys % len(dates)]}),
+            pd.DataFrame(means, columns=metrics)
+        ],
+        axis=1
+    )
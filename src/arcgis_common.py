@@ -0,0 +1,140 @@
+import json
+from collections.abc import Iterator
+from datetime import datetime as dt
+from urllib.parse import quote_plus
+
+import pandas as pd
+
+import src.http_client
+
+DEFAULT_ID_FIELD = 'OBJECTID'
+
+
+def format_date_predicate(date_col: str, max_date: str, date_format: str) -> str:
+    # max_date is formatted as yyyy-mm-dd
+    if date_format == 'timestamp_int':
+        return f"{date_col} > DATE '{max_date}'"
+
+    if date_format == 'epoch_ms':
+        max_date_timestamp = int(dt.strptime(max_date, '%Y-%m-%d').timestamp() * 1000)
+        return f'{date_col} > {max_date_timestamp}'
+
+    # string date columns are compared lexically, which holds for year-first formats (ex %Y/%m/%d)
+    formatted_date = dt.strptime(max_date, '%Y-%m-%d').strftime(date_format)
+    return f"{date_col} > '{formatted_date}'"
+
+
+def build_where(predicates: list[str]) -> str:
+    if not predicates:
+        return '1=1'
+    return ' AND '.join(predicates)
+
+
+def build_query_url(layer_url: str, where: str, out_fields: list[str], order_by: str | None = None) -> str:
+    out_fields_formatted = '%2C+'.join(out_fields)
+    order_by_formatted = '' if order_by is None else f'&orderByFields={quote_plus(order_by)}'
+
+    url_query = f'query?where={quote_plus(where)}&outFields={out_fields_formatted}{order_by_formatted}'
+    url_suffix = '&outSR=4326&f=json'
+    return f'{layer_url}/{url_query}{url_suffix}'
+
+
+def build_count_url(layer_url: str, where: str) -> str:
+    return f'{layer_url}/query?where={quote_plus(where)}&returnCountOnly=true&f=pjson'
+
+
+# retrieves value from rest request "count(*) as n"
+def get_num_records(url: str) -> int | None:
+    response = json.loads(src.http_client.get(url).content)
+
+    # layers that reject a where clause still respond with a 200 and an error body
+    if 'error' in response:
+        print(f'Query rejected: {response["error"]}')
+        return None
+
+    return response['count']
+
+
+def create_incremental_where(
+        layer_url: str,
+        filter_predicates: list[str],
+        date_col: str,
+        max_date: str,
+        date_format: str
+) -> tuple[str, int]:
+    date_predicate = format_date_predicate(date_col, max_date, date_format)
+    where = build_where(filter_predicates + [date_predicate])
+    num_records = get_num_records(build_count_url(layer_url, where))
+
+    if num_records is None:
+        print(f'Date predicate rejected by {layer_url}, falling back to client-side date filter')
+        where = build_where(filter_predicates)
+        num_records = get_num_records(build_count_url(layer_url, where))
+
+    if num_records is None:
+        raise Exception(f'Query rejected by {layer_url}')
+
+    return where, num_records
+
+
+def build_ids_url(layer_url: str, where: str) -> str:
+    return f'{layer_url}/query?where={quote_plus(where)}&returnIdsOnly=true&f=json'
+
+
+def get_object_ids(layer_url: str, where: str, id_field: str = DEFAULT_ID_FIELD,
+                   cache_ttl: int | None = 0) -> tuple[str, list[int]]:
+    # returnIdsOnly isn't capped at the layer's maxRecordCount, one request lists every matching id
+    response = json.loads(src.http_client.get(build_ids_url(layer_url, where), cache_ttl=cache_ttl).content)
+    if 'error' in response:
+        raise Exception(f'Query rejected by {layer_url}: {response["error"]}')
+
+    return response.get('objectIdFieldName', id_field), sorted(response['objectIds'] or [])
+
+
+def create_id_ranges(object_ids: list[int], page_size: int) -> list[tuple[int, int]]:
+    # ex [(1, 2000), (2001, 4000), ...] first + last id of each page_size ids, inclusive
+    return [
+        (object_ids[i], object_ids[min(i + page_size, len(object_ids)) - 1])
+        for i in range(0, len(object_ids), page_size)
+    ]
+
+
+def build_keyset_url(layer_url: str, where: str, out_fields: list[str], id_field: str, last_id: int | None,
+                     page_size: int) -> str:
+    keyset_where = where if last_id is None else build_where([f'({where})', f'{id_field} > {last_id}'])
+    fields = out_fields if id_field in out_fields else out_fields + [id_field]
+    url = build_query_url(layer_url, keyset_where, fields, order_by=f'{id_field} ASC')
+    return f'{url}&resultRecordCount={page_size}'
+
+
+def get_keyset_pages(layer_url: str, where: str, out_fields: list[str], page_size: int,
+                     id_field: str = DEFAULT_ID_FIELD, cache_ttl: int | None = 0) -> Iterator[pd.DataFrame]:
+    # pages on id_field > last id seen, ordered by id_field: each page is an index seek rather than a rescan
+    # from the first row (resultOffset), and rows can't shift between pages so there are no gaps or duplicates
+    last_id = None
+    while True:
+        url = build_keyset_url(layer_url, where, out_fields, id_field, last_id, page_size)
+        response = json.loads(src.http_client.get(url, cache_ttl=cache_ttl).content)
+        if 'error' in response:
+            raise Exception(f'Query rejected by {layer_url}: {response["error"]}')
+
+        features = response['features']
+        if not features:
+            return
+
+        df = pd.DataFrame.from_records(i['attributes'] for i in features)
+        last_id = int(df[id_field].max())
+        yield df if id_field in out_fields else df.drop(columns=[id_field])
+
+        # servers cap resultRecordCount at their maxRecordCount and flag the cut with exceededTransferLimit
+        if not response.get('exceededTransferLimit', False) and len(features) < page_size:
+            return
+
+
+def get_id_range(layer_url: str, where: str, out_fields: list[str], id_range: tuple[int, int], page_size: int,
+                 id_field: str = DEFAULT_ID_FIELD, cache_ttl: int | None = 0) -> pd.DataFrame | None:
+    # a range holds at most page_size ids, keyset paging within it covers servers whose maxRecordCount is smaller
+    first_id, last_id = id_range
+    range_where = build_where([f'({where})', f'{id_field} >= {first_id}', f'{id_field} <= {last_id}'])
+    pages = list(get_keyset_pages(layer_url, range_where, out_fields, page_size, id_field, cache_ttl))
+    return pd.concat(pages) if pages else None
@@ -0,0 +1,273 @@
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime as dt
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# archive layout: data/{schema}/archive/{table}/base_{date}.parquet + delta_{date}.parquet
+# a delta holds the rows inserted or changed since the previous snapshot plus the keys that were deleted,
+# a new base is written once a chain gets long so reconstruction stays bounded
+DEFAULT_KEYS = ['County', 'Date']
+MAX_DELTA_CHAIN = 30
+OP_COL = '_op'
+UPSERT = 'upsert'
+DELETE = 'delete'
+LEGACY_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def create_archive_dir(archive_root: str, table_name: str) -> Path:
+    return Path(archive_root) / table_name
+
+
+def load_manifest(archive_dir: Path) -> dict:
+    manifest_path = archive_dir / 'manifest.json'
+    if not manifest_path.exists():
+        return {'snapshots': []}
+    return json.loads(manifest_path.read_text())
+
+
+def write_manifest(archive_dir: Path, manifest: dict) -> None:
+    manifest_path = archive_dir / 'manifest.json'
+    temp_path = manifest_path.with_suffix(f'.{uuid.uuid4().hex}.tmp')
+    temp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp_path, manifest_path)
+
+
+def find_chain(manifest: dict, as_of: str) -> list[dict]:
+    # the latest base on or before as_of + every delta after it, up to as_of
+    snapshots = [x for x in manifest['snapshots'] if x['date'] <= as_of]
+    base_positions = [i for i, x in enumerate(snapshots) if x['type'] == 'base']
+    if not base_positions:
+        return []
+    return snapshots[base_positions[-1]:]
+
+
+def create_delta_schema(archive_dir: Path, base_snapshot: dict) -> pa.Schema:
+    # every delta in a chain shares its base's column types, so a chain is read as one arrow table
+    base_schema = pq.read_schema(archive_dir / base_snapshot['file']).remove_metadata()
+    return base_schema.append(pa.field(OP_COL, pa.string()))
+
+
+def read_chain(archive_dir: Path, chain: list[dict]) -> pd.DataFrame:
+    # base + deltas are stacked in date order and the last record of each key wins,
+    # so the whole chain is applied in one pass instead of one merge per delta
+    base_df = pd.read_parquet(archive_dir / chain[0]['file'])
+    keys = chain[-1]['keys']
+    if len(chain) == 1:
+        return base_df.sort_values(keys).reset_index(drop=True) if keys else base_df
+
+    delta_df = pa.concat_tables([pq.read_table(archive_dir / x['file']) for x in chain[1:]]).to_pandas()
+    df = pd.concat([base_df.assign(**{OP_COL: UPSERT}), delta_df], axis=0, ignore_index=True)
+    df = df.drop_duplicates(subset=keys, keep='last')
+    df = df[df[OP_COL] == UPSERT].drop(columns=[OP_COL])
+
+    # deleted keys are stored with null values, which widens int columns on the way back to pandas
+    df = df.astype(base_df.dtypes.to_dict())
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def list_legacy_files(archive_root: str, table_name: str) -> dict:
+    # full daily copies written before the delta archive, ex bexar_vitals_2023-07-01.parquet (or .csv)
+    legacy_files = {}
+    for file in Path(archive_root).glob(f'{table_name}_*'):
+        snapshot_date = file.stem.removeprefix(f'{table_name}_')
+        if LEGACY_DATE.fullmatch(snapshot_date) and file.suffix in ['.parquet', '.csv']:
+            # parquet wins when a day has both
+            if snapshot_date not in legacy_files or file.suffix == '.parquet':
+                legacy_files[snapshot_date] = file
+
+    return dict(sorted(legacy_files.items()))
+
+
+def read_legacy_file(file: Path) -> pd.DataFrame:
+    return pd.read_parquet(file) if file.suffix == '.parquet' else pd.read_csv(file)
+
+
+def read_as_of(archive_root: str, table_name: str, as_of: str) -> pd.DataFrame | None:
+    # as_of is a yyyy-mm-dd string, returns the table as it was archived on that day (or the latest day before it)
+    archive_dir = create_archive_dir(archive_root, table_name)
+    chain = find_chain(load_manifest(archive_dir), as_of)
+    if chain:
+        return read_chain(archive_dir, chain)
+
+    legacy_files = {k: v for k, v in list_legacy_files(archive_root, table_name).items() if k <= as_of}
+    if not legacy_files:
+        return None
+    return read_legacy_file(list(legacy_files.values())[-1])
+
+
+def list_snapshot_dates(archive_root: str, table_name: str) -> list[str]:
+    manifest = load_manifest(create_archive_dir(archive_root, table_name))
+    return [x['date'] for x in manifest['snapshots']]
+
+
+def has_unique_keys(df: pd.DataFrame, keys: list[str]) -> bool:
+    if not all(key in df.columns for key in keys):
+        return False
+    return not df.duplicated(subset=keys).any()
+
+
+def create_delta(previous_df: pd.DataFrame, df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    value_cols = [col for col in df.columns if col not in keys]
+    previous_hashes = pd.util.hash_pandas_object(previous_df[value_cols], index=False).set_axis(
+        pd.MultiIndex.from_frame(previous_df[keys])
+    )
+    current_hashes = pd.util.hash_pandas_object(df[value_cols], index=False).set_axis(
+        pd.MultiIndex.from_frame(df[keys])
+    )
+
+    is_new_or_changed = ~current_hashes.index.isin(previous_hashes.index)
+    is_existing = ~is_new_or_changed
+    is_new_or_changed[is_existing] = (
+        current_hashes[is_existing].values
+        != previous_hashes.reindex(current_hashes.index[is_existing]).values
+    )
+    is_deleted = ~previous_hashes.index.isin(current_hashes.index)
+
+    delta_df = pd.concat(
+        [
+            df[is_new_or_changed].assign(**{OP_COL: UPSERT}),
+            previous_df.loc[is_deleted, keys].assign(**{OP_COL: DELETE}),
+        ],
+        axis=0,
+        ignore_index=True
+    )
+    return delta_df
+
+
+def write_snapshot(df: pd.DataFrame, archive_root: str, table_name: str, snapshot_date: str | None = None,
+                   keys: list[str] | None = None) -> dict:
+    snapshot_date = dt.now().strftime('%Y-%m-%d') if snapshot_date is None else snapshot_date
+    keys = DEFAULT_KEYS if keys is None else keys
+    archive_dir = create_archive_dir(archive_root, table_name)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    # a second run on the same day replaces that day's snapshot
+    manifest = load_manifest(archive_dir)
+    assert all(x['date'] <= snapshot_date for x in manifest['snapshots']), f'{table_name} has snapshots after {snapshot_date}'
+    replaced = [x for x in manifest['snapshots'] if x['date'] == snapshot_date]
+    manifest['snapshots'] = [x for x in manifest['snapshots'] if x['date'] < snapshot_date]
+
+    chain = find_chain(manifest, snapshot_date)
+    previous_df = None if not chain else read_chain(archive_dir, chain)
+    snapshot_keys = keys if has_unique_keys(df, keys) else []
+
+    is_delta = (
+        previous_df is not None
+        and len(chain) <= MAX_DELTA_CHAIN
+        and previous_df.columns.tolist() == df.columns.tolist()
+        and previous_df.dtypes.equals(df.dtypes)
+        and chain[-1]['keys'] == keys
+        and snapshot_keys == keys
+    )
+
+    if is_delta:
+        snapshot_df = create_delta(previous_df, df, keys)
+        snapshot = {'date': snapshot_date, 'type': 'delta', 'file': f'delta_{snapshot_date}.parquet'}
+        delta_schema = create_delta_schema(archive_dir, chain[0])
+        pq.write_table(pa.Table.from_pandas(snapshot_df, schema=delta_schema, preserve_index=False),
+                       archive_dir / snapshot['file'])
+    else:
+        snapshot_df = df
+        snapshot = {'date': snapshot_date, 'type': 'base', 'file': f'base_{snapshot_date}.parquet'}
+        snapshot_df.to_parquet(archive_dir / snapshot['file'], index=False)
+
+    snapshot['keys'] = snapshot_keys
+    snapshot['rows'] = snapshot_df.shape[0]
+
+    manifest['snapshots'].append(snapshot)
+    write_manifest(archive_dir, manifest)
+
+    for old_snapshot in replaced:
+        if old_snapshot['file'] != snapshot['file']:
+            (archive_dir / old_snapshot['file']).unlink(missing_ok=True)
+
+    return snapshot
+
+
+# region benchmark ----
+def replay_legacy_archive(archive_root: str, table_name: str, delta_root: str, keys: list[str]) -> dict:
+    # writes every legacy parquet copy of a table into a delta archive in date order
+    legacy_files = {k: v for k, v in list_legacy_files(archive_root, table_name).items() if v.suffix == '.parquet'}
+    for snapshot_date, file in legacy_files.items():
+        write_snapshot(pd.read_parquet(file), delta_root, table_name, snapshot_date=snapshot_date, keys=keys)
+    return legacy_files
+
+
+def benchmark_table(archive_root: str, table_name: str, delta_root: str, keys: list[str]) -> dict:
+    legacy_files = replay_legacy_archive(archive_root, table_name, delta_root, keys)
+    delta_dir = create_archive_dir(delta_root, table_name)
+    manifest = load_manifest(delta_dir)
+
+    legacy_seconds = 0
+    delta_seconds = 0
+    for snapshot_date, file in legacy_files.items():
+        start = time.perf_counter()
+        legacy_df = pd.read_parquet(file)
+        legacy_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        delta_df = read_as_of(delta_root, table_name, snapshot_date)
+        delta_seconds += time.perf_counter() - start
+
+        # a base snapshot is returned as written, a delta chain sorted on its keys
+        snapshot_keys = find_chain(manifest, snapshot_date)[-1]['keys']
+        if snapshot_keys:
+            legacy_df = legacy_df.sort_values(snapshot_keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(legacy_df, delta_df)
+
+    return {
+        'table_name': table_name,
+        'snapshots': len(legacy_files),
+        'bases': sum(x['type'] == 'base' for x in manifest['snapshots']),
+        'legacy_mb': sum(x.stat().st_size for x in legacy_files.values()) / 1e6,
+        'delta_mb': sum(x.stat().st_size for x in delta_dir.glob('*.parquet')) / 1e6,
+        'legacy_read_s': legacy_seconds,
+        'delta_read_s': delta_seconds,
+    }
+
+
+def main():
+    # every snapshot is rebuilt from the delta archive and compared to its full copy
+    archive_tables = {
+        'data/origin/vitals/archive': {x: DEFAULT_KEYS for x in [
+            'bexar_vitals', 'denton_vitals', 'el_paso_vitals', 'galveston_vitals', 'harris_vitals',
+            'nueces_vitals', 'potter_vitals', 'randall_vitals', 'tarrant_vitals', 'travis_vitals'
+        ]},
+        'data/origin/vitals_state/archive': {'new_texas_vitals': ['Level_Type', 'Level', 'Date']},
+        'data/origin/wastewater/archive': {
+            'biobot_wastewater': DEFAULT_KEYS,
+            'cdc_wastewater': DEFAULT_KEYS,
+            'houston_plant': DEFAULT_KEYS,
+            'houston_zip': ['zipcode', 'Date'],
+        },
+        'data/intermediate/vitals/archive': {
+            'dashboard_vitals_combined': DEFAULT_KEYS,
+            'state_vitals_combined': ['Level_Type', 'Level', 'Date'],
+            'usa_facts_vitals_clean': DEFAULT_KEYS,
+        },
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for archive_root, tables in archive_tables.items():
+            for table_name, keys in tables.items():
+                results.append(benchmark_table(archive_root, table_name, temp_dir, keys))
+
+    results_df = pd.DataFrame(results)
+    totals = results_df.drop(columns=['table_name']).sum().to_frame('total').T.assign(table_name='total')
+    print(pd.concat([results_df, totals], axis=0, ignore_index=True).round(3).to_string(index=False))
+
+
+# endregion
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+import src.archive
+from src.dataset_storage import serialize_schema, deserialize_schema
+
+# one index over every data/**/archive dir: archive root -> table -> snapshot date -> file entry
+# covers the legacy full copies ({table}_{date}.parquet/.csv) + the delta archives ({table}/manifest.json)
+INDEX_PATH = 'data/archive_index.json'
+DATE_COLS = ['Date', 'date']
+LEGACY_FILE = re.compile(r'(?P<table>.+)_(?P<date>\d{4}-\d{2}-\d{2})')
+
+
+# region index ----
+def find_archive_roots(root_dir: str = 'data') -> list[str]:
+    return sorted(str(x) for x in Path(root_dir).rglob('archive') if x.is_dir())
+
+
+def list_archive_files(archive_root: str) -> list[dict]:
+    # every snapshot file under an archive dir, before its contents are looked at
+    archive_files = []
+    for file in Path(archive_root).iterdir():
+        match = LEGACY_FILE.fullmatch(file.stem)
+        if file.is_file() and match is not None and file.suffix in ['.parquet', '.csv']:
+            archive_files.append({
+                'table_name': match['table'],
+                'date': match['date'],
+                'file': str(file),
+                'format': file.suffix.removeprefix('.'),
+                'type': 'full',
+                'keys': [],
+            })
+
+    for manifest_path in Path(archive_root).glob('*/manifest.json'):
+        archive_dir = manifest_path.parent
+        for snapshot in src.archive.load_manifest(archive_dir)['snapshots']:
+            archive_files.append({
+                'table_name': archive_dir.name,
+                'date': snapshot['date'],
+                'file': str(archive_dir / snapshot['file']),
+                'format': 'parquet',
+                'type': snapshot['type'],
+                'keys': snapshot['keys'],
+            })
+
+    return archive_files
+
+
+def find_date_col(schema: pa.Schema) -> str | None:
+    return next((col for col in DATE_COLS if col in schema.names), None)
+
+
+def format_date(value) -> str:
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def scan_parquet(file: str) -> dict:
+    # row counts + date range come from the footer, the row groups are only read when stats are missing
+    metadata = pq.ParquetFile(file).metadata
+    schema = metadata.schema.to_arrow_schema().remove_metadata()
+    date_col = find_date_col(schema)
+
+    min_date, max_date = None, None
+    if date_col is not None and metadata.num_rows > 0:
+        col_position = schema.get_field_index(date_col)
+        stats = [metadata.row_group(i).column(col_position).statistics for i in range(metadata.num_row_groups)]
+        if all(x is not None and x.has_min_max for x in stats):
+            min_date = format_date(min(x.min for x in stats))
+            max_date = format_date(max(x.max for x in stats))
+        else:
+            date_range = pc.min_max(pq.read_table(file, columns=[date_col]).column(date_col))
+            min_date, max_date = format_date(date_range['min'].as_py()), format_date(date_range['max'].as_py())
+
+    return {'schema': schema, 'rows': metadata.num_rows, 'date_col': date_col, 'min_date': min_date, 'max_date': max_date}
+
+
+def scan_csv(file: str) -> dict:
+    table = pcsv.read_csv(file)
+    date_col = find_date_col(table.schema)
+
+    min_date, max_date = None, None
+    if date_col is not None and table.num_rows > 0:
+        date_range = pc.min_max(table.column(date_col))
+        min_date, max_date = format_date(date_range['min'].as_py()), format_date(date_range['max'].as_py())
+
+    return {'schema': table.schema, 'rows': table.num_rows, 'date_col': date_col, 'min_date': min_date, 'max_date': max_date}
+
+
+def create_index_entry(archive_file: dict, file_stat: os.stat_result) -> dict:
+    scan = scan_parquet(archive_file['file']) if archive_file['format'] == 'parquet' else scan_csv(archive_file['file'])
+    return {
+        **{k: v for k, v in archive_file.items() if k not in ['table_name', 'date']},
+        'size': file_stat.st_size,
+        'mtime_ns': file_stat.st_mtime_ns,
+        'columns': scan['schema'].names,
+        'schema': serialize_schema(scan['schema']),
+        'rows': scan['rows'],
+        'date_col': scan['date_col'],
+        'min_date': scan['min_date'],
+        'max_date': scan['max_date'],
+    }
+
+
+def load_index(index_path: str = INDEX_PATH) -> dict:
+    if not Path(index_path).exists():
+        return {'archives': {}}
+    return json.loads(Path(index_path).read_text())
+
+
+def write_index(index: dict, index_path: str = INDEX_PATH) -> None:
+    temp_path = Path(index_path).with_suffix(f'.{uuid.uuid4().hex}.tmp')
+    temp_path.write_text(json.dumps(index, indent=2))
+    os.replace(temp_path, index_path)
+
+
+def update_index(root_dir: str = 'data', index_path: str = INDEX_PATH) -> tuple[dict, dict]:
+    # only new or modified files (size / mtime) are opened, everything else is carried over from the last index
+    previous_entries = {
+        entry['file']: entry
+        for archive in load_index(index_path)['archives'].values()
+        for snapshots in archive['tables'].values()
+        for entry in snapshots.values()
+    }
+
+    stats = {'scanned': 0, 'reused': 0, 'removed': 0}
+    archives = {}
+    for archive_root in find_archive_roots(root_dir):
+        tables = {}
+        for archive_file in list_archive_files(archive_root):
+            file_stat = os.stat(archive_file['file'])
+            previous_entry = previous_entries.pop(archive_file['file'], None)
+
+            is_unchanged = (
+                previous_entry is not None
+                and previous_entry['size'] == file_stat.st_size
+                and previous_entry['mtime_ns'] == file_stat.st_mtime_ns
+            )
+            if is_unchanged:
+                entry = previous_entry
+                stats['reused'] += 1
+            else:
+                entry = create_index_entry(archive_file, file_stat)
+                stats['scanned'] += 1
+
+            snapshots = tables.setdefault(archive_file['table_name'], {})
+            existing = snapshots.get(archive_file['date'])
+            # one file per day: the delta archive wins over a legacy copy, parquet wins over csv
+            if existing is None or existing['type'] == 'full' and (entry['type'] != 'full' or entry['format'] == 'parquet'):
+                snapshots[archive_file['date']] = entry
+
+        archives[archive_root] = {'tables': {k: dict(sorted(v.items())) for k, v in sorted(tables.items())}}
+
+    stats['removed'] = len(previous_entries)
+    index = {'archives': archives}
+    write_index(index, index_path)
+    return index, stats
+
+
+# endregion
+
+# region queries ----
+def find_snapshots(index: dict, table_name: str, archive_root: str | None = None) -> dict:
+    matches = {
+        root: archive['tables'][table_name]
+        for root, archive in index['archives'].items()
+        if table_name in archive['tables'] and (archive_root is None or root == archive_root)
+    }
+    assert matches, f'{table_name} is not archived'
+    assert len(matches) == 1, f'{table_name} is archived in {list(matches)}, pass archive_root'
+    return list(matches.values())[0]
+
+
+def list_snapshots(table_name: str, archive_root: str | None = None, index: dict | None = None) -> pd.DataFrame:
+    index = load_index() if index is None else index
+    snapshots = find_snapshots(index, table_name, archive_root)
+    return (
+        pd.DataFrame.from_dict(snapshots, orient='index')
+        .rename_axis('snapshot_date')
+        .reset_index()
+        [['snapshot_date', 'type', 'format', 'rows', 'min_date', 'max_date', 'file']]
+    )
+
+
+def is_outside_date_range(entry: dict, filters: dict) -> bool:
+    # the footer date range rules a file out without opening it
+    date_col = entry['date_col']
+    if date_col not in filters or entry['min_date'] is None:
+        return False
+    filter_date = format_date(filters[date_col])
+    return filter_date < entry['min_date'] or filter_date > entry['max_date']
+
+
+def create_filter_expression(filters: dict, schema: pa.Schema) -> pc.Expression:
+    # values are cast to the file's column type, the same date can be a string, date32 or timestamp across snapshots
+    expressions = [pc.field(col) == pa.scalar(value).cast(schema.field(col).type) for col, value in filters.items()]
+    filter_expression = expressions[0]
+    for expression in expressions[1:]:
+        filter_expression = filter_expression & expression
+    return filter_expression
+
+
+def read_snapshot_rows(entry: dict, filters: dict, columns: list[str]) -> pd.DataFrame:
+    schema = deserialize_schema(entry['schema'])
+    filter_expression = create_filter_expression(filters, schema)
+
+    if entry['format'] == 'parquet':
+        table = pq.read_table(entry['file'], columns=columns, filters=filter_expression)
+    else:
+        convert_options = pcsv.ConvertOptions(include_columns=columns, column_types=schema)
+        table = pcsv.read_csv(entry['file'], convert_options=convert_options).filter(filter_expression)
+
+    # dates are compared as strings across snapshots, their stored type changes over time
+    df = table.to_pandas()
+    for col in [x for x in columns if x in DATE_COLS]:
+        df[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%d')
+    return df
+
+
+def query_revisions(table_name: str, filters: dict, columns: list[str] | None = None,
+                    archive_root: str | None = None, index: dict | None = None) -> pd.DataFrame:
+    # every archived version of the rows matching filters, ex
+    # query_revisions('harris_vitals', {'County': 'Harris', 'Date': '2023-06-01'}, ['cases_daily'])
+    index = load_index() if index is None else index
+    snapshots = find_snapshots(index, table_name, archive_root)
+
+    revisions = []
+    state_df = None
+    for snapshot_date, entry in snapshots.items():
+        value_cols = [col for col in (columns or entry['columns']) if col != src.archive.OP_COL]
+        read_cols = list(dict.fromkeys(list(filters) + entry['keys'] + value_cols))
+
+        if not all(col in entry['columns'] for col in list(filters) + value_cols):
+            state_df = None
+            continue
+
+        if entry['type'] == 'delta':
+            # a delta only holds what changed, so the matching rows are carried forward from the snapshot before it
+            if state_df is not None and not is_outside_date_range(entry, filters):
+                delta_df = read_snapshot_rows(entry, filters, read_cols + [src.archive.OP_COL])
+                state_df = (
+                    pd.concat([state_df.assign(**{src.archive.OP_COL: src.archive.UPSERT}), delta_df], ignore_index=True)
+                    .drop_duplicates(subset=entry['keys'], keep='last')
+                    .query(f'{src.archive.OP_COL} == @src.archive.UPSERT')
+                    .drop(columns=[src.archive.OP_COL])
+                )
+        elif is_outside_date_range(entry, filters):
+            state_df = pd.DataFrame(columns=read_cols)
+        else:
+            state_df = read_snapshot_rows(entry, filters, read_cols)
+
+        if state_df is not None and state_df.shape[0] > 0:
+            revisions.append(state_df[list(dict.fromkeys(list(filters) + value_cols))].assign(snapshot_date=snapshot_date))
+
+    if not revisions:
+        return pd.DataFrame(columns=['snapshot_date'] + list(filters) + (columns or []))
+
+    revisions_df = pd.concat(revisions, axis=0, ignore_index=True)
+    return revisions_df[['snapshot_date'] + [x for x in revisions_df.columns if x != 'snapshot_date']]
+
+
+# endregion
+
+
+def main():
+    start = time.perf_counter()
+    index, stats = update_index()
+    print(f'indexed {len(index["archives"])} archive dirs in {time.perf_counter() - start:.2f}s: {stats}')
+
+    start = time.perf_counter()
+    revisions_df = query_revisions('harris_vitals', {'County': 'Harris', 'Date': '2023-06-01'}, ['cases_daily'], index=index)
+    print(f'harris 2023-06-01 revisions in {time.perf_counter() - start:.2f}s')
+    print(revisions_df.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
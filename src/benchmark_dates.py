@@ -0,0 +1,60 @@
+import time
+
+import pandas as pd
+
+from src.utils import convert_date, load_parquet
+
+TABLES = ['county_vitals', 'wastewater', 'wastewater_plant']
+SCALES = [1, 50]
+
+
+# region legacy implementation kept as the reference
+def convert_date_legacy(date_series: pd.Series, date_format: str) -> pd.Series:
+    if date_format == 'timestamp_int':
+        return pd.to_datetime(date_series * 1_000_000).dt.date
+
+    return pd.to_datetime(date_series, format=date_format).dt.date
+
+
+# endregion
+
+
+def time_run(run_fn, *args) -> float:
+    start = time.perf_counter()
+    run_fn(*args)
+    return time.perf_counter() - start
+
+
+def create_raw_dates(table_name: str, scale: int) -> pd.Series:
+    # epoch ms, the shape the arcgis + houston layers return
+    dates = load_parquet(f'data/tableau/{table_name}.parquet')['Date']
+    epoch_ms = (pd.to_datetime(dates).astype('int64') // 1_000_000)
+    return pd.concat([epoch_ms] * scale, ignore_index=True)
+
+
+def benchmark(table_name: str, scale: int) -> dict:
+    raw_dates = create_raw_dates(table_name, scale)
+
+    legacy_dates = convert_date_legacy(raw_dates, 'timestamp_int')
+    dates = convert_date(raw_dates, 'timestamp_int')
+    assert (pd.to_datetime(legacy_dates) == dates).all()
+
+    # every downstream step that sorts, filters or joins on Date converted the python dates back to datetime64
+    return {
+        'table_name': table_name,
+        'rows': raw_dates.shape[0],
+        'legacy_parse_s': time_run(convert_date_legacy, raw_dates, 'timestamp_int'),
+        'parse_s': time_run(convert_date, raw_dates, 'timestamp_int'),
+        'legacy_round_trip_s': time_run(pd.to_datetime, legacy_dates),
+        'legacy_mb': legacy_dates.memory_usage(deep=True) / 1e6,
+        'mb': dates.memory_usage(deep=True) / 1e6,
+    }
+
+
+def main():
+    results = pd.DataFrame([benchmark(table_name, scale) for table_name in TABLES for scale in SCALES])
+    print(results.round(4).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
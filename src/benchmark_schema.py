@@ -0,0 +1,57 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import src.table_writer
+from etl.schema_registry import SCHEMA_MODELS, apply_schema
+
+TABLE_PATHS = {
+    table_name: f'data/intermediate/vitals/{table_name}.parquet' if table_name == 'all_county_vitals_combined'
+    else f'data/tableau/{table_name}.parquet'
+    for table_name in SCHEMA_MODELS
+}
+
+
+def measure_table(df: pd.DataFrame, out_dir: str) -> dict:
+    file_path = f'{out_dir}/table.parquet'
+    src.table_writer.write_table(df, {'parquet': file_path})
+
+    start = time.perf_counter()
+    pd.read_parquet(file_path)
+    return {
+        'memory_mb': df.memory_usage(deep=True).sum() / 1e6,
+        'disk_mb': Path(file_path).stat().st_size / 1e6,
+        'read_s': time.perf_counter() - start,
+    }
+
+
+def benchmark(table_name: str, out_dir: str) -> dict:
+    # untyped is the table as pandas read it before the registry: object strings + python dates
+    untyped_df = pd.read_parquet(TABLE_PATHS[table_name])
+    typed_df = apply_schema(untyped_df, table_name)
+    SCHEMA_MODELS[table_name].validate(typed_df)
+
+    untyped = measure_table(untyped_df, out_dir)
+    typed = measure_table(typed_df, out_dir)
+    return {
+        'table_name': table_name,
+        'rows': untyped_df.shape[0],
+        **{f'untyped_{k}': v for k, v in untyped.items()},
+        **{f'typed_{k}': v for k, v in typed.items()},
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = pd.DataFrame([
+            benchmark(table_name, temp_dir)
+            for table_name, table_path in TABLE_PATHS.items()
+            if Path(table_path).exists()
+        ])
+    print(results.round(4).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,47 @@
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
 from pathlib import Path
+from urllib.parse import urlparse
 
 import pandas as pd
-import requests
 import yaml
-import time
 
+import src.http_client
 from src.utils import load_csv, write_file
 from src.county_vitals.request_common import clean_request_data
+from src.arcgis_common import (
+    create_incremental_where,
+    get_object_ids,
+    create_id_ranges,
+    get_id_range,
+    DEFAULT_ID_FIELD
+)
 from functools import reduce
 
+# shared across counties so layers on the same arcgis host (ex randall + potter) respect one limit
+HOST_SEMAPHORES: dict[str, threading.BoundedSemaphore] = {}
+HOST_SEMAPHORES_LOCK = threading.Lock()
+
+
+def get_host_semaphore(url: str, max_concurrency: int) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with HOST_SEMAPHORES_LOCK:
+        if host not in HOST_SEMAPHORES:
+            HOST_SEMAPHORES[host] = threading.BoundedSemaphore(max_concurrency)
+    return HOST_SEMAPHORES[host]
+
 
 def get_data_manager(config: dict) -> pd.DataFrame | None:
-    def format_date(max_date_timestamp: int, config: dict) -> int | str:
+    def format_date(max_date: str, config: dict) -> int | str:
+        max_date_timestamp = int(dt.strptime(max_date, '%Y-%m-%d').timestamp() * 1000)
         if config['col']['date_format'] == 'timestamp_int':
             return max_date_timestamp
 
         formatted_date = dt.fromtimestamp(max_date_timestamp / 1000).strftime(config['col']['date_format'])
         return formatted_date
 
-    def get_max_date(config: dict) -> int | str:
+    def get_max_date(config: dict) -> str:
         if not config['full_refresh'] and config['file_exists']:
             file_path = f'{config["out"]["dir"]}/{config["out"]["table_name"]}'
 
@@ -29,90 +50,77 @@ def get_data_manager(config: dict) -> pd.DataFrame | None:
         else:
             max_date = dt.strftime(dt(1999, 12, 31), '%Y-%m-%d')
 
-        max_date_timestamp = int(dt.strptime(max_date, '%Y-%m-%d').timestamp() * 1000)
-        date_out = format_date(max_date_timestamp, config)
-        return date_out
-
-    def get_offsets(request_url: str, step_interval: int) -> list:
-        def create_num_records_request(url: str) -> str:
-            url_base = url.split('&outFields=')[0]
-            url_count_suffix = '&returnCountOnly=true&f=pjson'
-            url_out = f'{url_base}{url_count_suffix}'
-            return url_out
-
-        # retrieves value from rest request "count(*) as n"
-        def get_num_records(url) -> int:
-            response = requests.get(url)
-            output = json.loads(response.content)['count']
-            return output
-
-        num_records_request = create_num_records_request(request_url)
-        offsets = list(range(0, get_num_records(num_records_request), step_interval))
-        return offsets
-
-    def get_data(url: str, offset: int):
-        url = f'{url}{offset}'
-        request = requests.get(url)
-        response = json.loads(request.content)['features']
-        df = pd.DataFrame.from_records(i['attributes'] for i in response)
-        return df
-
-    def create_request_url(config) -> str:
+        return max_date
+
+    def create_layer_url(config) -> str:
         url_config = config['url']
         source_table = url_config['source_table']
         owner = url_config['owner']
         feature_server_id = url_config['feature_server_id']
 
         url_location = url_config['base']
-        url_suffix = '&outSR=4326&f=json&resultOffset='
 
         url_base_prep = f'{url_location}/{owner}/arcgis/rest/services/{source_table}'
         url_base = f'{url_base_prep}/FeatureServer/{feature_server_id}'
+        return url_base
 
-        if 'filter' in config['col']:
-            filter_config = config['col']['filter']
-            url_query_where = f'where={filter_config["col"]}%3D%27{filter_config["value"]}%27'
-        else:
-            url_query_where = 'where=1%3D1'
-
-        col_list = config['col']['input']
-        col_list_formatted = '%2C+'.join(col_list)
-        url_query = f'query?{url_query_where}&outFields={col_list_formatted}{url_suffix}'
-
-        url_out = f'{url_base}/{url_query}'
+    def create_filter_predicates(config) -> list[str]:
+        if 'filter' not in config['col']:
+            return []
 
-        return url_out
+        filter_config = config['col']['filter']
+        return [f"{filter_config['col']} = '{filter_config['value']}'"]
 
     def get_date_col(config: dict) -> str:
         return ([k for k, v in config['col']['rename'].items() if v == 'Date'][0])
 
-    request_url = create_request_url(config)
     date_col = get_date_col(config)
     max_date = get_max_date(config)
 
-    offsets = get_offsets(
-        request_url=request_url,
-        step_interval=config['step_interval']
+    # still applied client-side for layers that reject (or ignore) the date predicate
+    max_date_formatted = format_date(max_date, config)
+
+    layer_url = create_layer_url(config)
+    where, _ = create_incremental_where(
+        layer_url=layer_url,
+        filter_predicates=create_filter_predicates(config),
+        date_col=date_col,
+        max_date=max_date,
+        date_format=config['col'].get('where_date_format', config['col']['date_format'])
     )
 
-    new_df_list = []
-    for offset in offsets:
-        print(f'Obtaining data with offset: {offset}')
+    # the matching ids are split into ranges of step_interval ids, each range is an index seek on the layer's id
+    id_field, object_ids = get_object_ids(
+        layer_url=layer_url,
+        where=where,
+        id_field=config['url'].get('id_field', DEFAULT_ID_FIELD),
+        cache_ttl=config['url']['cache_ttl']
+    )
+    id_ranges = create_id_ranges(object_ids, config['step_interval'])
+    print(f'Obtaining {len(object_ids)} records in {len(id_ranges)} pages')
 
-        df = get_data(request_url, offset)
+    host_semaphore = get_host_semaphore(layer_url, config['url']['max_concurrency'])
 
-        # filtering by date/timestamp in rest query wasn't working
-        df_new = (df.query(f'{date_col} > @max_date'))
-        if df_new.empty:
-            break
+    def get_id_range_limited(id_range: tuple[int, int]) -> pd.DataFrame | None:
+        with host_semaphore:
+            return get_id_range(
+                layer_url=layer_url,
+                where=where,
+                out_fields=config['col']['input'],
+                id_range=id_range,
+                page_size=config['step_interval'],
+                id_field=id_field,
+                cache_ttl=config['url']['cache_ttl']
+            )
 
-        new_df_list.append(df_new)
+    # ranges are fetched concurrently but consumed in id order
+    with ThreadPoolExecutor(max_workers=config['url']['max_concurrency']) as executor:
+        pages = [df for df in executor.map(get_id_range_limited, id_ranges) if df is not None]
 
-    if not new_df_list:
-        return None
+    new_df_list = [df[df[date_col] > max_date_formatted] for df in pages]
+    new_df_list = [df for df in new_df_list if not df.empty]
+    return pd.concat(new_df_list) if new_df_list else None
 
-    new_df_combined = pd.concat(new_df_list)
-    return new_df_combined
 
 def parse_data_manager(config: dict) -> pd.DataFrame | None:
     attempts = 0
@@ -122,11 +130,13 @@ def parse_data_manager(config: dict) -> pd.DataFrame | None:
             raw_data = get_data_manager(config)
             break
         except KeyError:
+            print(f'Attempt {attempts + 1} failed')
+            src.http_client.sleep_with_backoff(attempts)
             attempts += 1
-            print(f'Attempt {attempts} failed')
-            time.sleep(2 * 60)
             continue
 
+    src.http_client.print_stats()
+
     if raw_data is None:
         print(f'No new data found')
         return None
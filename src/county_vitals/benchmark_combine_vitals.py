@@ -0,0 +1,206 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.county_vitals.combine_vitals import (
+    list_files,
+    load_files,
+    combine_vitals,
+    clean_vitals
+)
+
+METRIC_COLS = ['cases_daily', 'deaths_daily', 'cases_cumulative', 'deaths_cumulative']
+
+
+# region legacy implementation (groupby-apply + row-wise apply) kept as the reference for equivalence checks
+def combine_vitals_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    def fix_daily_missing(df: pd.DataFrame, column: str) -> pd.Series:
+        fixed_df = (
+            df
+            .assign(not_is_null=lambda x: ~x[f'{column}_daily'].isnull())
+            .assign(
+                row_num_not_null=lambda x: x.groupby(['County'], group_keys=False)['not_is_null'].apply(
+                    lambda y: y.shift(0).fillna(True).cumsum()
+                ).astype(int)
+            )
+            .assign(
+                fixed_col=lambda x: np.where(
+                    x['row_num_not_null'] == 0,
+                    x[f'{column}_cumulative'],
+                    x[f'{column}_daily']
+                )
+            )
+        )
+
+        output = fixed_df['fixed_col']
+        return output
+
+    def handle_cumulative(df: pd.DataFrame) -> pd.DataFrame:
+        cumulative_counties = (
+            df
+            [['County', 'Date', 'cases_cumulative', 'deaths_cumulative']]
+            .replace(0, pd.NA)
+            .dropna(subset=['cases_cumulative', 'deaths_cumulative'], how='all')
+            .assign(cases_daily=lambda x: x.groupby('County')['cases_cumulative'].diff())
+            .assign(deaths_daily=lambda x: x.groupby('County')['deaths_cumulative'].diff())
+            .assign(cases_daily=lambda x: fix_daily_missing(x, 'cases'))
+            .assign(deaths_daily=lambda x: fix_daily_missing(x, 'deaths'))
+        )
+        return cumulative_counties
+
+    def handle_daily(df: pd.DataFrame) -> pd.DataFrame:
+        daily_counties = (
+            df
+            [['County', 'Date', 'cases_daily', 'deaths_daily']]
+            .dropna(subset=['cases_daily', 'deaths_daily'], how='all')
+            .groupby('County', group_keys=False)
+            .apply(
+                lambda group: group
+                .assign(cases_daily=lambda x: np.where(x['cases_daily'].isnull().all(), 0, x['cases_daily']))
+                .assign(deaths_daily=lambda x: np.where(x['deaths_daily'].isnull().all(), 0, x['deaths_daily']))
+                .assign(cases_cumulative=lambda x: x['cases_daily'].cumsum())
+                .assign(deaths_cumulative=lambda x: x['deaths_daily'].cumsum())
+            )
+        )
+        return daily_counties
+
+    sorted_df_orig = df.sort_values(['County', 'Date']).reset_index(drop=True)
+    cumulative_counties = handle_cumulative(sorted_df_orig)
+    daily_counties = handle_daily(sorted_df_orig)
+    county_files_combined = pd.concat([cumulative_counties, daily_counties], axis=0)
+    return county_files_combined
+
+
+def clean_vitals_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    def replace_cumulative_vals(row: pd.Series, column: str) -> pd.Series:
+        if pd.isna(row['diff']):
+            return row[column]
+        elif row['diff'] < 0:
+            return row['shifted']
+        else:
+            return row[column]
+
+    def clean_vitals_prep(df: pd.DataFrame) -> pd.DataFrame:
+        county_vitals_prep = (
+            df
+            .sort_values(['County', 'Date'])
+            .reset_index(drop=True)
+            .assign(Date=lambda x: pd.to_datetime(x['Date']).dt.date)
+            .assign(cases_daily=lambda x: x['cases_daily'].clip(lower=0))
+            .assign(cases_daily=lambda x: x['cases_daily'].fillna(0))
+            .assign(deaths_daily=lambda x: x['deaths_daily'].clip(lower=0))
+            .assign(deaths_daily=lambda x: x['deaths_daily'].fillna(0))
+        )
+        return county_vitals_prep
+
+    def clean_vitals_monotonic(df: pd.DataFrame, column) -> pd.DataFrame:
+        county_vitals_ensure_monotonic = (
+            df
+            .groupby('County', group_keys=True)
+            .apply(
+                lambda group: group
+                .assign(diff=lambda x: x[column].diff())
+                .assign(shifted=lambda x: x[column].shift())
+                .assign(**{column: lambda x: x.apply(lambda row: replace_cumulative_vals(row, column), axis=1)})
+                .drop(['diff', 'shifted'], axis=1)
+            )
+            .reset_index(drop=True)
+        )
+
+        return county_vitals_ensure_monotonic
+
+    county_vitals_prep_orig = clean_vitals_prep(df)
+    county_vitals_ensure_monotonic_cases = clean_vitals_monotonic(county_vitals_prep_orig, 'cases_cumulative')
+    county_vitals_ensure_monotonic_deaths = clean_vitals_monotonic(
+        county_vitals_ensure_monotonic_cases,
+        'deaths_cumulative'
+    )
+
+    county_vitals_clean = (
+        county_vitals_ensure_monotonic_deaths
+        .assign(cases_cumulative=lambda x: x.groupby(['County'])['cases_cumulative'].ffill())
+        .assign(deaths_cumulative=lambda x: x.groupby(['County'])['deaths_cumulative'].ffill())
+        .assign(cases_cumulative=lambda x: x['cases_cumulative'].fillna(0))
+        .assign(deaths_cumulative=lambda x: x['deaths_cumulative'].fillna(0))
+        .astype(
+            {
+                'cases_cumulative': 'Int32',
+                'cases_daily': 'Int32',
+                'deaths_cumulative': 'Int32',
+                'deaths_daily': 'Int32'
+            }
+        )
+        .assign(source='county level dashboards')
+        .assign(Date=lambda x: pd.to_datetime(x['Date']).dt.date)
+    )
+    return county_vitals_clean
+
+
+# endregion
+
+
+def run_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    return clean_vitals(combine_vitals(df))
+
+
+def run_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    return clean_vitals_legacy(combine_vitals_legacy(df))
+
+
+def check_equivalence(df: pd.DataFrame) -> None:
+    # intermediate dtypes differ (object vs Int32) so the combined frames are compared on values
+    combined = combine_vitals(df).astype({col: 'Float64' for col in METRIC_COLS})
+    combined_legacy = combine_vitals_legacy(df).astype({col: 'Float64' for col in METRIC_COLS})
+    pd.testing.assert_frame_equal(combined, combined_legacy)
+
+    # the legacy output holds python dates, the vectorized one keeps datetime64
+    legacy_df = run_legacy(df).assign(Date=lambda x: pd.to_datetime(x['Date']))
+    pd.testing.assert_frame_equal(run_vectorized(df), legacy_df)
+
+
+def create_synthetic_counties(df: pd.DataFrame, scale: int) -> pd.DataFrame:
+    synthetic_df = pd.concat(
+        [df.assign(County=lambda x: x['County'] + f'_{i}') for i in range(scale)],
+        axis=0
+    )
+    return synthetic_df
+
+
+def time_run(run_fn, df: pd.DataFrame) -> float:
+    start_time = time.perf_counter()
+    run_fn(df)
+    return time.perf_counter() - start_time
+
+
+def benchmark(df: pd.DataFrame, scales: list[int]) -> pd.DataFrame:
+    results = []
+    for scale in scales:
+        synthetic_df = create_synthetic_counties(df, scale)
+        for path, run_fn in [('legacy', run_legacy), ('vectorized', run_vectorized)]:
+            run_seconds = time_run(run_fn, synthetic_df)
+            results.append(
+                {
+                    'path': path,
+                    'scale': scale,
+                    'rows': synthetic_df.shape[0],
+                    'seconds': round(run_seconds, 3),
+                    'rows_per_second': round(synthetic_df.shape[0] / run_seconds)
+                }
+            )
+
+    return pd.DataFrame(results)
+
+
+def main():
+    county_files_combined_raw = load_files(list_files())
+
+    check_equivalence(county_files_combined_raw)
+    print('Vectorized output matches legacy output')
+
+    results = benchmark(county_files_combined_raw, scales=[1, 10, 100])
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
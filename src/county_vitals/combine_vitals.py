@@ -1,10 +1,18 @@
 import datetime
+import hashlib
+import json
+import os
 from datetime import datetime as dt
+from pathlib import Path
+
 import pandas as pd
 import glob
 from src.utils import write_file, load_parquet
 import numpy as np
 
+VITALS_COLS = ['County', 'Date', 'cases_daily', 'deaths_daily', 'cases_cumulative', 'deaths_cumulative']
+CUMULATIVE_COLS = ['cases_cumulative', 'deaths_cumulative']
+
 
 def list_files() -> list:
     vitals_dir = 'data/origin/vitals/'
@@ -15,28 +23,41 @@ def load_files(file_list: list) -> pd.DataFrame:
     return pd.concat([load_parquet(f) for f in file_list], axis=0)
 
 
+def load_file(file_path: str) -> pd.DataFrame:
+    # single county files only carry the metrics they report
+    return load_parquet(file_path).reindex(columns=VITALS_COLS)
+
+
 def combine_vitals(df: pd.DataFrame) -> pd.DataFrame:
     def fix_daily_missing(df: pd.DataFrame, column: str) -> pd.Series:
-        fixed_df = (
-            df
-            .assign(not_is_null=lambda x: ~x[f'{column}_daily'].isnull())
-            .assign(
-                row_num_not_null=lambda x: x.groupby(['County'], group_keys=False)['not_is_null'].apply(
-                    lambda y: y.shift(0).fillna(True).cumsum()
-                ).astype(int)
-            )
-            .assign(
-                fixed_col=lambda x: np.where(
-                    x['row_num_not_null'] == 0,
-                    x[f'{column}_cumulative'],
-                    x[f'{column}_daily']
-                )
-            )
+        # rows before a county's first non-null daily value fall back to the cumulative value
+        row_num_not_null = (
+            df[f'{column}_daily']
+            .notna()
+            .groupby(df['County'])
+            .cumsum()
         )
 
-        output = fixed_df['fixed_col']
+        output = pd.Series(
+            np.where(
+                row_num_not_null == 0,
+                df[f'{column}_cumulative'],
+                df[f'{column}_daily']
+            ),
+            index=df.index
+        )
         return output
 
+    def fill_all_missing_daily(df: pd.DataFrame, column: str) -> pd.Series:
+        # counties that never report a metric get 0s instead of nulls
+        county_has_values = (
+            df[column]
+            .notna()
+            .groupby(df['County'])
+            .transform('any')
+        )
+        return df[column].where(county_has_values, 0)
+
     def handle_cumulative(df: pd.DataFrame) -> pd.DataFrame:
         cumulative_counties = (
             df
@@ -55,14 +76,10 @@ def combine_vitals(df: pd.DataFrame) -> pd.DataFrame:
             df
             [['County', 'Date', 'cases_daily', 'deaths_daily']]
             .dropna(subset=['cases_daily', 'deaths_daily'], how='all')
-            .groupby('County', group_keys=False)
-            .apply(
-                lambda group: group
-                .assign(cases_daily=lambda x: np.where(x['cases_daily'].isnull().all(), 0, x['cases_daily']))
-                .assign(deaths_daily=lambda x: np.where(x['deaths_daily'].isnull().all(), 0, x['deaths_daily']))
-                .assign(cases_cumulative=lambda x: x['cases_daily'].cumsum())
-                .assign(deaths_cumulative=lambda x: x['deaths_daily'].cumsum())
-            )
+            .assign(cases_daily=lambda x: fill_all_missing_daily(x, 'cases_daily'))
+            .assign(deaths_daily=lambda x: fill_all_missing_daily(x, 'deaths_daily'))
+            .assign(cases_cumulative=lambda x: x.groupby('County')['cases_daily'].cumsum())
+            .assign(deaths_cumulative=lambda x: x.groupby('County')['deaths_daily'].cumsum())
         )
         return daily_counties
 
@@ -74,20 +91,12 @@ def combine_vitals(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def clean_vitals(df: pd.DataFrame) -> pd.DataFrame:
-    def replace_cumulative_vals(row: pd.Series, column: str) -> pd.Series:
-        if pd.isna(row['diff']):
-            return row[column]
-        elif row['diff'] < 0:
-            return row['shifted']
-        else:
-            return row[column]
-
     def clean_vitals_prep(df: pd.DataFrame) -> pd.DataFrame:
         county_vitals_prep = (
             df
             .sort_values(['County', 'Date'])
             .reset_index(drop=True)
-            .assign(Date=lambda x: pd.to_datetime(x['Date']).dt.date)
+            .assign(Date=lambda x: pd.to_datetime(x['Date']))
             .assign(cases_daily=lambda x: x['cases_daily'].clip(lower=0))
             .assign(cases_daily=lambda x: x['cases_daily'].fillna(0))
             .assign(deaths_daily=lambda x: x['deaths_daily'].clip(lower=0))
@@ -96,17 +105,13 @@ def clean_vitals(df: pd.DataFrame) -> pd.DataFrame:
         return county_vitals_prep
 
     def clean_vitals_monotonic(df: pd.DataFrame, column) -> pd.DataFrame:
+        # a cumulative value below the previous day's value is replaced by the previous day's value
+        county_values = df.groupby('County')[column]
+        is_decrease = (county_values.diff() < 0).fillna(False).astype(bool)
+
         county_vitals_ensure_monotonic = (
             df
-            .groupby('County', group_keys=True)
-            .apply(
-                lambda group: group
-                .assign(diff=lambda x: x[column].diff())
-                .assign(shifted=lambda x: x[column].shift())
-                .assign(**{column: lambda x: x.apply(lambda row: replace_cumulative_vals(row, column), axis=1)})
-                .drop(['diff', 'shifted'], axis=1)
-            )
-            .reset_index(drop=True)
+            .assign(**{column: df[column].mask(is_decrease, county_values.shift())})
         )
 
         return county_vitals_ensure_monotonic
@@ -139,11 +144,189 @@ def clean_vitals(df: pd.DataFrame) -> pd.DataFrame:
             }
         )
         .assign(source='county level dashboards')
-        .assign(Date=lambda x: pd.to_datetime(x['Date']).dt.date)
     )
     return county_vitals_clean
 
 
+# region incremental --------------------------------------------------------------------------------
+def hash_file(file_path: str) -> str:
+    return hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+
+
+def hash_rows(df: pd.DataFrame) -> str:
+    sorted_df = (
+        df
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
+        .sort_values(['County', 'Date'])
+        .reset_index(drop=True)
+    )
+    row_hashes = pd.util.hash_pandas_object(sorted_df, index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def load_watermarks(watermark_path: str) -> dict:
+    if not Path(watermark_path).exists():
+        return {}
+    return json.loads(Path(watermark_path).read_text())
+
+
+def write_watermarks(watermarks: dict, watermark_path: str) -> None:
+    # written to a temp file + swapped in, a reader never sees a half written file
+    Path(watermark_path).parent.mkdir(parents=True, exist_ok=True)
+    temp_path = f'{watermark_path}.{os.getpid()}.tmp'
+    Path(temp_path).write_text(json.dumps(watermarks, indent=2))
+    os.replace(temp_path, watermark_path)
+
+
+def create_file_watermark(file_path: str, raw_df: pd.DataFrame, combined_df: pd.DataFrame,
+                          clean_df: pd.DataFrame) -> dict | None:
+    # an empty file has no watermark, it's recomputed (cheaply) on the next run
+    last_date = pd.to_datetime(raw_df['Date']).max()
+    if pd.isna(last_date):
+        return None
+
+    # cumulative values at the watermark, before (combined) and after (clean) the monotonic + fill steps
+    def get_last_values(df: pd.DataFrame) -> dict:
+        # the cumulative sum skips null daily values, so the running total is the last non-null value
+        last_rows = (
+            df
+            .assign(**{col: df.groupby('County')[col].ffill() for col in CUMULATIVE_COLS})
+            [pd.to_datetime(df['Date']) == last_date]
+            .set_index('County')
+            [CUMULATIVE_COLS]
+            .astype('Float64')
+        )
+        return {
+            county: {col: (None if pd.isna(value) else float(value)) for col, value in values.items()}
+            for county, values in last_rows.to_dict(orient='index').items()
+        }
+
+    watermark = {
+        'mtime': os.path.getmtime(file_path),
+        'file_hash': hash_file(file_path),
+        'rows_hash': hash_rows(raw_df),
+        'last_date': last_date.strftime('%Y-%m-%d'),
+        'counties': sorted(raw_df['County'].unique().tolist()),
+        'combined_carry_over': get_last_values(combined_df),
+        'clean_carry_over': get_last_values(clean_df),
+    }
+    return watermark
+
+
+def file_changed(file_path: str, watermark: dict | None) -> bool:
+    if watermark is None:
+        return True
+
+    if os.path.getmtime(file_path) == watermark['mtime']:
+        return False
+
+    return hash_file(file_path) != watermark['file_hash']
+
+
+def combine_vitals_tail(raw_df: pd.DataFrame, existing_df: pd.DataFrame,
+                        watermark: dict) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    # recomputes only the rows after the watermark, seeded from the carry-over state at the watermark
+    last_date = pd.Timestamp(watermark['last_date'])
+    raw_dates = pd.to_datetime(raw_df['Date'])
+
+    # rows up to the watermark must be untouched, otherwise history was revised
+    if hash_rows(raw_df[raw_dates <= last_date]) != watermark['rows_hash']:
+        return None
+
+    # the rows at the watermark are kept as the seed for diffs + cumulative sums, then dropped
+    combined_tail = (
+        combine_vitals(raw_df[raw_dates >= last_date])
+        .astype({col: 'Float64' for col in VITALS_COLS[2:]})
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
+    )
+
+    seed_rows = combined_tail.query('Date == @last_date').set_index('County')
+    if sorted(seed_rows.index) != sorted(watermark['combined_carry_over']):
+        return None
+
+    # daily counties restart their cumulative sum at the seed, shift it back onto the stored totals
+    combined_carry_over = pd.DataFrame.from_dict(watermark['combined_carry_over'], orient='index').astype('Float64')
+    daily_counties = raw_df.dropna(subset=['cases_daily', 'deaths_daily'], how='all')['County'].unique()
+    cumulative_offsets = (
+        (combined_carry_over - seed_rows[CUMULATIVE_COLS].fillna(0))
+        .fillna(0)
+        .loc[lambda x: x.index.isin(daily_counties)]
+    )
+    for col in CUMULATIVE_COLS:
+        combined_tail[col] = combined_tail[col] + combined_tail['County'].map(cumulative_offsets[col]).fillna(0)
+
+    # the monotonic fix compares against the previous combined value, the forward fill carries the cleaned one:
+    # the day before the watermark holds the cleaned values and the watermark row holds the combined values
+    clean_carry_over = pd.DataFrame.from_dict(watermark['clean_carry_over'], orient='index').astype('Float64')
+    clean_seed_rows = (
+        clean_carry_over
+        .rename_axis('County')
+        .reset_index()
+        .assign(Date=last_date - pd.Timedelta(days=1))
+    )
+
+    combined_new = combined_tail.query('Date > @last_date')
+    clean_new = (
+        clean_vitals(pd.concat([clean_seed_rows, combined_tail], axis=0))
+        .query('Date > @last_date')
+    )
+
+    existing_rows = existing_df[existing_df['County'].isin(watermark['counties'])]
+    clean_df = pd.concat([existing_rows, clean_new], axis=0)
+    combined_seed_rows = combined_tail.query('Date == @last_date').set_index('County').fillna(combined_carry_over)
+    combined_df = pd.concat([combined_seed_rows.reset_index(), combined_new], axis=0)
+    return combined_df, clean_df
+
+
+def combine_vitals_incremental(file_list: list, existing_df: pd.DataFrame | None, watermarks: dict,
+                               full_refresh: bool = False) -> tuple[pd.DataFrame, dict]:
+    # watermarks only hold if the existing output is the one they were written alongside
+    if existing_df is None or existing_df.shape[0] != watermarks.get('output_rows'):
+        full_refresh = True
+
+    file_watermarks = {} if full_refresh else watermarks.get('files', {})
+
+    output_list = []
+    new_file_watermarks = {}
+    for file_path in file_list:
+        watermark = file_watermarks.get(file_path)
+
+        if not file_changed(file_path, watermark):
+            print(f'{file_path}: unchanged')
+            output_list.append(existing_df[existing_df['County'].isin(watermark['counties'])])
+            new_file_watermarks[file_path] = {**watermark, 'mtime': os.path.getmtime(file_path)}
+            continue
+
+        raw_df = load_file(file_path)
+        tail_results = None if watermark is None else combine_vitals_tail(raw_df, existing_df, watermark)
+
+        if tail_results is None:
+            print(f'{file_path}: recomputing full history')
+            combined_df = combine_vitals(raw_df)
+            clean_df = clean_vitals(combined_df)
+        else:
+            print(f'{file_path}: recomputing rows after {watermark["last_date"]}')
+            combined_df, clean_df = tail_results
+
+        output_list.append(clean_df)
+        file_watermark = create_file_watermark(file_path, raw_df, combined_df, clean_df)
+        if file_watermark is not None:
+            new_file_watermarks[file_path] = file_watermark
+
+    output_df = (
+        pd.concat(output_list, axis=0)
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
+        .sort_values(['County', 'Date'])
+        .reset_index(drop=True)
+    )
+
+    new_watermarks = {'output_rows': output_df.shape[0], 'files': new_file_watermarks}
+    return output_df, new_watermarks
+
+
+# endregion
+
+
 def main():
     county_files = list_files()
     county_files_combined_raw = load_files(county_files)
@@ -4,6 +4,7 @@ import pandas as pd
 import requests
 import yaml
 
+import src.http_client
 from src.county_vitals.request_common import clean_request_data
 from src.utils import write_file
 from datetime import datetime as dt
@@ -29,10 +30,11 @@ def parse_response(response: requests.Response, config: dict) -> pd.DataFrame |
 
 
 def get_data(config: dict) -> requests.Response:
-    response = requests.post(
+    response = src.http_client.post(
         url=config['url']['base'],
         headers=config['url']['headers'],
         json=config['url']['payload'],
+        cache_ttl=config['url']['cache_ttl']
     )
     return response
 
@@ -0,0 +1,122 @@
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from src.county_vitals.usa_facts.get_usa_fact_vitals import combine_vitals
+
+VITALS_PATH = 'data/origin/vitals/other_sources/usa_facts_vitals.parquet'
+VITAL_TYPES = ['cases', 'deaths']
+
+
+# region legacy implementation (transpose + melt + merge) kept as the reference for equivalence checks
+def get_vitals_legacy(raw_df: pd.DataFrame, vital_type: str) -> pd.DataFrame:
+    clean_df = (
+        raw_df
+        .drop(columns=['countyFIPS', 'StateFIPS', 'State'])
+        .rename(columns={'County Name': 'county'})
+        .set_index('county')
+        .T
+        .reset_index()
+        .rename(columns={'index': 'date'})
+        .melt(id_vars=['date'], var_name='county', value_name=f'{vital_type}_cumulative')
+        .assign(county=lambda x: x['county'].str.replace(' County', ''))
+        .assign(date=lambda x: pd.to_datetime(x['date']))
+        .sort_values(['county', 'date'])
+        .reset_index(drop=True)
+    )
+    return clean_df
+
+
+def combine_vitals_legacy(results: list) -> pd.DataFrame:
+    final_df = (
+        pd.merge(results[0], results[1], on=['date', 'county'])
+        .assign(cases_daily=lambda x: x.groupby('county')['cases_cumulative'].diff())
+        .assign(deaths_daily=lambda x: x.groupby('county')['deaths_cumulative'].diff())
+        .assign(source='usafacts.org')
+    )
+    return final_df
+
+
+# endregion
+
+
+def run_vectorized(vitals_tables: dict[str, pa.Table]) -> pd.DataFrame:
+    return combine_vitals(vitals_tables)
+
+
+def run_legacy(vitals_tables: dict[str, pa.Table]) -> pd.DataFrame:
+    # the legacy get_vitals converted the wide arrow table to pandas before reshaping
+    results = [get_vitals_legacy(vitals_tables[x].to_pandas(), x) for x in VITAL_TYPES]
+    return combine_vitals_legacy(results)
+
+
+def create_wide_tables(df: pd.DataFrame, scale: int) -> dict[str, pa.Table]:
+    # back to the usafacts layout, one row per county + one column per date, extra counties ex Harris_3
+    synthetic_df = pd.concat(
+        [df.assign(county=lambda x: x['county'] + f'_{i}') for i in range(scale)],
+        axis=0
+    ) if scale > 1 else df
+
+    vitals_tables = {}
+    for vital_type in VITAL_TYPES:
+        wide_df = (
+            synthetic_df
+            .pivot(index='county', columns='date', values=f'{vital_type}_cumulative')
+            .rename(columns=lambda x: x.strftime('%Y-%m-%d'))
+        )
+        id_df = pd.DataFrame({
+            'countyFIPS': range(wide_df.shape[0]),
+            'County Name': wide_df.index + ' County',
+            'State': 'TX',
+            'StateFIPS': 48
+        })
+        vitals_tables[vital_type] = pa.Table.from_pandas(
+            pd.concat([id_df, wide_df.reset_index(drop=True)], axis=1),
+            preserve_index=False
+        )
+    return vitals_tables
+
+
+def check_equivalence(vitals_tables: dict[str, pa.Table]) -> None:
+    pd.testing.assert_frame_equal(run_vectorized(vitals_tables), run_legacy(vitals_tables))
+
+
+def time_run(run_fn, vitals_tables: dict[str, pa.Table]) -> float:
+    start_time = time.perf_counter()
+    run_fn(vitals_tables)
+    return time.perf_counter() - start_time
+
+
+def benchmark(df: pd.DataFrame, scales: list[int]) -> pd.DataFrame:
+    results = []
+    for scale in scales:
+        vitals_tables = create_wide_tables(df, scale)
+        rows = vitals_tables['cases'].num_rows * (vitals_tables['cases'].num_columns - 4)
+        for path, run_fn in [('legacy', run_legacy), ('vectorized', run_vectorized)]:
+            run_seconds = time_run(run_fn, vitals_tables)
+            results.append(
+                {
+                    'path': path,
+                    'scale': scale,
+                    'rows': rows,
+                    'seconds': round(run_seconds, 3),
+                    'rows_per_second': round(rows / run_seconds)
+                }
+            )
+
+    return pd.DataFrame(results)
+
+
+def main():
+    vitals_df = pd.read_parquet(VITALS_PATH)
+
+    check_equivalence(create_wide_tables(vitals_df, 1))
+    print('Vectorized output matches legacy output')
+
+    results = benchmark(vitals_df, scales=[1, 10])
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,25 @@
+from functools import reduce
+
+import numpy as np
 import pandas as pd
-import requests
-import io
+import pyarrow as pa
 import yaml
 from pathlib import Path
 from dotenv import load_dotenv
 import os
 from datetime import datetime as dt
 
+import src.http_client
+import src.utils
+
+# the date columns are inferred, one per day since 2020-01-22
+USA_FACTS_COLUMN_TYPES = {
+    'countyFIPS': pa.int64(),
+    'County Name': pa.string(),
+    'State': pa.string(),
+    'StateFIPS': pa.int64()
+}
+
 
 def clean_vitals(df: pd.DataFrame) -> pd.DataFrame:
     load_dotenv()
@@ -20,57 +33,81 @@ def clean_vitals(df: pd.DataFrame) -> pd.DataFrame:
                 'county': 'County'
             }
         )
-        .assign(Date=lambda x: pd.to_datetime(x.Date).dt.date)
+        .assign(Date=lambda x: pd.to_datetime(x.Date))
     )
 
     return clean_df
 
 
-def get_vitals(config: dict) -> pd.DataFrame:
-    response = requests.get(
+def get_vitals(config: dict) -> pa.Table:
+    response = src.http_client.get(
         config['url'],
         cookies=config['cookies'],
-        headers=config['headers']
+        headers=config['headers'],
+        cache_ttl=config['cache_ttl'],
+        stream=True
     )
 
-    raw_data = response.content
-    raw_df = pd.read_csv(io.StringIO(raw_data.decode('utf-8')))
+    # only the texas rows of the national file are kept, still wide: one column per date
+    with src.utils.open_response_body(response) as body:
+        vitals_table, read_stats = src.utils.read_csv_table(
+            body,
+            src.utils.create_state_predicate('State'),
+            column_types=USA_FACTS_COLUMN_TYPES
+        )
+    print(f'usafacts {config["vital_type"]}: {read_stats}')
+    assert vitals_table is not None, f'no texas rows in the usafacts {config["vital_type"]} file'
+    return vitals_table
 
-    clean_df = (
-        raw_df
-        .query('State == "TX"')
-        .drop(columns=['countyFIPS', 'StateFIPS', 'State'])
-        .rename(columns={'County Name': 'county'})
-        .set_index('county')
-        .T
-        .reset_index()
-        .rename(columns={'index': 'date'})
-        .melt(id_vars=['date'], var_name='county', value_name=f'{config["vital_type"]}_cumulative')
-        .assign(county=lambda x: x['county'].str.replace(' County', ''))
-        .assign(date=lambda x: pd.to_datetime(x['date']))
-        .sort_values(['county', 'date'])
-        .reset_index(drop=True)
-    )
-    return clean_df
 
+def create_vitals_block(vitals_table: pa.Table) -> tuple[pd.Index, pd.DatetimeIndex, np.ndarray]:
+    # counties x dates int32 block filled straight from the arrow date columns, no transposed object frame
+    counties = pd.Index(vitals_table.column('County Name').to_pandas().str.replace(' County', ''))
+    assert counties.is_unique, 'duplicate usafacts counties'
 
-def combine_vitals(results: list) -> pd.DataFrame:
-    final_df = (
-        pd.merge(results[0], results[1], on=['date', 'county'])
-        .assign(cases_daily=lambda x: x.groupby('county')['cases_cumulative'].diff())
-        .assign(deaths_daily=lambda x: x.groupby('county')['deaths_cumulative'].diff())
-        .assign(source='usafacts.org')
-    )
+    date_cols = [col for col in vitals_table.column_names if col not in USA_FACTS_COLUMN_TYPES]
+    values = np.empty((vitals_table.num_rows, len(date_cols)), dtype=np.int32, order='F')
+    for i, col in enumerate(date_cols):
+        date_values = vitals_table.column(col)
+        assert date_values.null_count == 0, f'null usafacts values on {col}'
+        # the safe cast raises on counts past int32
+        values[:, i] = date_values.cast(pa.int32()).to_numpy()
+
+    return counties, pd.DatetimeIndex(pd.to_datetime(date_cols)), values
+
+
+def combine_vitals(vitals_tables: dict[str, pa.Table]) -> pd.DataFrame:
+    # ex combine_vitals({'cases': cases_table, 'deaths': deaths_table})
+    blocks = {vital_type: create_vitals_block(vitals_table) for vital_type, vitals_table in vitals_tables.items()}
+
+    # only the counties + dates in every file are kept, same as an inner merge of the long tables
+    counties = reduce(pd.Index.intersection, [block[0] for block in blocks.values()]).sort_values()
+    dates = reduce(pd.Index.intersection, [block[1] for block in blocks.values()]).sort_values()
+
+    cumulative, daily = {}, {}
+    for vital_type, (block_counties, block_dates, values) in blocks.items():
+        aligned = values[np.ix_(block_counties.get_indexer(counties), block_dates.get_indexer(dates))]
+        cumulative[f'{vital_type}_cumulative'] = aligned.ravel().astype(np.int64)
+        # the first date of each county has no previous day
+        daily_values = np.full(aligned.shape, np.nan)
+        daily_values[:, 1:] = np.diff(aligned, axis=1)
+        daily[f'{vital_type}_daily'] = daily_values.ravel()
+
+    # rows are county major, one row per county + date
+    final_df = pd.DataFrame({
+        'date': np.tile(dates.to_numpy(), len(counties)),
+        'county': np.repeat(counties.to_numpy(), len(dates)),
+        **cumulative,
+        **daily,
+        'source': 'usafacts.org'
+    })
     return final_df
 
 
 def main() -> None:
     config = yaml.safe_load(Path('usa_facts_config.yaml').read_text())
-    results = [
-        get_vitals(config['cases']),
-        get_vitals(config['deaths'])
-    ]
-    final_df = combine_vitals(results)
+    vitals_tables = {vital_type: get_vitals(config[vital_type]) for vital_type in ['cases', 'deaths']}
+    final_df = combine_vitals(vitals_tables)
     # final_df.to_csv('data/usa_fact_vitals.csv', index=False)
 
 
@@ -0,0 +1,280 @@
+import base64
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime as dt
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# hive partitioned table layout: data/{schema}/{table}/County=Harris/month=2023-09/part-*.parquet
+# _manifest.json lists the live files, so readers never see a partition mid rewrite or mid compaction
+MANIFEST_NAME = '_manifest.json'
+MONTH_COL = 'month'
+COMPACT_MIN_FILES = 2
+
+# writers + the nightly compaction both rewrite the manifest and remove files, they hold the dataset's lock file
+LOCK_NAME = '_lock'
+LOCK_POLL_SECONDS = 0.5
+LOCK_TIMEOUT_SECONDS = 30 * 60
+# a lock left behind by a killed process is broken after this long
+LOCK_STALE_SECONDS = 2 * 60 * 60
+
+
+def create_manifest_path(base_dir: str) -> Path:
+    return Path(base_dir) / MANIFEST_NAME
+
+
+def is_dataset(base_dir: str) -> bool:
+    return create_manifest_path(base_dir).exists()
+
+
+def load_manifest(base_dir: str) -> dict | None:
+    manifest_path = create_manifest_path(base_dir)
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text())
+
+
+def write_manifest(base_dir: str, manifest: dict) -> None:
+    manifest_path = create_manifest_path(base_dir)
+    temp_path = manifest_path.with_suffix(f'.{uuid.uuid4().hex}.tmp')
+    temp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp_path, manifest_path)
+
+
+@contextmanager
+def lock_dataset(base_dir: str):
+    # an O_EXCL lock file works across processes (dagster's multiprocess executor) + platforms
+    Path(base_dir).mkdir(parents=True, exist_ok=True)
+    lock_path = Path(base_dir) / LOCK_NAME
+    start = time.monotonic()
+    while True:
+        try:
+            lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                is_stale = time.time() - lock_path.stat().st_mtime > LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                continue
+            if is_stale:
+                print(f'{lock_path}: breaking a stale lock')
+                lock_path.unlink(missing_ok=True)
+                continue
+            assert time.monotonic() - start < LOCK_TIMEOUT_SECONDS, f'timed out waiting for {lock_path}'
+            time.sleep(LOCK_POLL_SECONDS)
+
+    try:
+        os.write(lock_fd, f'{os.getpid()}'.encode('ascii'))
+        os.close(lock_fd)
+        yield
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+
+def add_partition_cols(df: pd.DataFrame, partitioning: list[str]) -> pd.DataFrame:
+    # month is derived from Date, every other partition column must already exist
+    if MONTH_COL in partitioning and MONTH_COL not in df.columns:
+        return df.assign(**{MONTH_COL: pd.to_datetime(df['Date']).dt.strftime('%Y-%m')})
+    return df
+
+
+def create_partition_path(partitioning: list[str], values: tuple) -> str:
+    return '/'.join(f'{col}={quote(str(value), safe="")}' for col, value in zip(partitioning, values))
+
+
+def hash_rows(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def serialize_schema(schema: pa.Schema) -> str:
+    return base64.b64encode(schema.serialize().to_pybytes()).decode('ascii')
+
+
+def deserialize_schema(schema_text: str) -> pa.Schema:
+    return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(schema_text)))
+
+
+def write_partition_file(base_dir: str, partition_path: str, table: pa.Table) -> str:
+    file_path = f'{partition_path}/part-{dt.now().strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:8]}.parquet'
+    Path(f'{base_dir}/{partition_path}').mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, f'{base_dir}/{file_path}')
+    return file_path
+
+
+def remove_files(base_dir: str, file_paths: list[str]) -> None:
+    for file_path in file_paths:
+        Path(f'{base_dir}/{file_path}').unlink(missing_ok=True)
+
+
+def write_dataset(df: pd.DataFrame, base_dir: str, partitioning: list[str]) -> dict:
+    with lock_dataset(base_dir):
+        return write_partitions(df, base_dir, partitioning)
+
+
+def write_partitions(df: pd.DataFrame, base_dir: str, partitioning: list[str]) -> dict:
+    # callers hold the dataset lock
+    # unchanged partitions are skipped, partitions that only gained rows at the end get a delta file
+    # and anything else (revised or removed rows) is rewritten
+    assert df[[col for col in partitioning if col != MONTH_COL]].notnull().all().all(), 'null partition values'
+
+    partitioned_df = add_partition_cols(df, partitioning)
+    data_cols = [col for col in df.columns if col not in partitioning]
+    # every file shares one schema, ex a delta whose column is all null is still written with the column type
+    schema = pa.Schema.from_pandas(partitioned_df[data_cols], preserve_index=False)
+
+    manifest = load_manifest(base_dir)
+    is_compatible = (
+        manifest is not None
+        and manifest['partitioning'] == partitioning
+        and manifest['columns'] == df.columns.tolist()
+        and deserialize_schema(manifest['schema']).equals(schema, check_metadata=False)
+    )
+    if not is_compatible:
+        previous_files = [] if manifest is None else [x for y in manifest['partitions'].values() for x in y['files']]
+        manifest = {
+            'columns': df.columns.tolist(),
+            'partitioning': partitioning,
+            'schema': serialize_schema(schema),
+            'partitions': {}
+        }
+    else:
+        previous_files = []
+
+    stats = {'unchanged': 0, 'appended': 0, 'rewritten': 0, 'removed': 0}
+    new_partitions = {}
+    replaced_files = []
+    for values, partition_df in partitioned_df.groupby(partitioning, sort=False, observed=True):
+        values = values if isinstance(values, tuple) else (values,)
+        partition_path = create_partition_path(partitioning, values)
+        partition_data = partition_df[data_cols].reset_index(drop=True)
+        existing = manifest['partitions'].get(partition_path)
+
+        partition_hash = hash_rows(partition_data)
+        if existing is not None and existing['hash'] == partition_hash:
+            new_partitions[partition_path] = existing
+            stats['unchanged'] += 1
+            continue
+
+        is_append = (
+            existing is not None
+            and partition_data.shape[0] > existing['rows']
+            and hash_rows(partition_data.iloc[:existing['rows']]) == existing['hash']
+        )
+
+        if is_append:
+            delta_table = pa.Table.from_pandas(partition_data.iloc[existing['rows']:], schema=schema, preserve_index=False)
+            delta_file = write_partition_file(base_dir, partition_path, delta_table)
+            files = existing['files'] + [delta_file]
+            stats['appended'] += 1
+        else:
+            partition_table = pa.Table.from_pandas(partition_data, schema=schema, preserve_index=False)
+            files = [write_partition_file(base_dir, partition_path, partition_table)]
+            replaced_files.extend([] if existing is None else existing['files'])
+            stats['rewritten'] += 1
+
+        new_partitions[partition_path] = {
+            'values': [str(x) for x in values],
+            'hash': partition_hash,
+            'rows': partition_data.shape[0],
+            'files': files
+        }
+
+    removed_partitions = [x for x in manifest['partitions'] if x not in new_partitions]
+    for partition_path in removed_partitions:
+        replaced_files.extend(manifest['partitions'][partition_path]['files'])
+        stats['removed'] += 1
+
+    Path(base_dir).mkdir(parents=True, exist_ok=True)
+    write_manifest(base_dir, {**manifest, 'partitions': new_partitions})
+
+    # only removed once the manifest no longer points at them
+    remove_files(base_dir, replaced_files + previous_files)
+    return stats
+
+
+def create_dataset(base_dir: str, manifest: dict) -> ds.Dataset:
+    file_paths = [
+        f'{base_dir}/{file_path}'
+        for partition in manifest['partitions'].values()
+        for file_path in partition['files']
+    ]
+    partitioning = ds.partitioning(
+        pa.schema([(col, pa.string()) for col in manifest['partitioning']]),
+        flavor='hive'
+    )
+    schema = deserialize_schema(manifest['schema'])
+    for col in manifest['partitioning']:
+        schema = schema.append(pa.field(col, pa.string()))
+
+    return ds.dataset(
+        file_paths,
+        schema=schema,
+        format='parquet',
+        partitioning=partitioning,
+        partition_base_dir=base_dir
+    )
+
+
+def read_dataset(base_dir: str, columns: list[str] | None = None,
+                 filter_expression: ds.Expression | None = None) -> pd.DataFrame:
+    manifest = load_manifest(base_dir)
+    output_cols = manifest['columns'] if columns is None else columns
+
+    if not manifest['partitions']:
+        return pd.DataFrame(columns=output_cols)
+
+    dataset = create_dataset(base_dir, manifest)
+    return dataset.to_table(columns=output_cols, filter=filter_expression).to_pandas(date_as_object=False)
+
+
+def get_dataset_schema(base_dir: str) -> pa.Schema:
+    return create_dataset(base_dir, load_manifest(base_dir)).schema
+
+
+def compact_dataset(base_dir: str, min_files: int = COMPACT_MIN_FILES) -> dict:
+    # a write_dataset during compaction waits, otherwise its files would be dropped from the manifest or deleted
+    with lock_dataset(base_dir):
+        return compact_partitions(base_dir, min_files)
+
+
+def compact_partitions(base_dir: str, min_files: int = COMPACT_MIN_FILES) -> dict:
+    # callers hold the dataset lock, merges the base + delta files of each partition back into one file
+    manifest = load_manifest(base_dir)
+    stats = {'compacted_partitions': 0, 'removed_files': 0}
+
+    replaced_files = []
+    for partition_path, partition in manifest['partitions'].items():
+        if len(partition['files']) < min_files:
+            continue
+
+        partition_table = pa.concat_tables(
+            [pq.read_table(f'{base_dir}/{file_path}') for file_path in partition['files']]
+        )
+        compacted_file = write_partition_file(base_dir, partition_path, partition_table)
+
+        replaced_files.extend(partition['files'])
+        stats['removed_files'] += len(partition['files'])
+        stats['compacted_partitions'] += 1
+        partition['files'] = [compacted_file]
+
+    write_manifest(base_dir, manifest)
+    remove_files(base_dir, replaced_files)
+    return stats
+
+
+def list_datasets(root_dir: str = 'data') -> list[str]:
+    return sorted(str(x.parent) for x in Path(root_dir).rglob(MANIFEST_NAME))
+
+
+def compact_datasets(root_dir: str = 'data', min_files: int = COMPACT_MIN_FILES) -> dict:
+    return {base_dir: compact_dataset(base_dir, min_files) for base_dir in list_datasets(root_dir)}
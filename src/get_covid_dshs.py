@@ -1,13 +1,19 @@
 from datetime import datetime as dt
 from datetime import timedelta
+import io
 import pandas as pd
 import re
-import requests
 from bs4 import BeautifulSoup
 
+import src.http_client
+
+# the surveillance page is read twice per run (table + report date), the second read is served from cache
+DSHS_CACHE_TTL = 6 * 60 * 60
+
 
 def get_result_table(base_url: str) -> pd.DataFrame:
-    dshs_table = pd.read_html(base_url)
+    page_response = src.http_client.get(base_url, cache_ttl=DSHS_CACHE_TTL)
+    dshs_table = pd.read_html(io.StringIO(page_response.text))
     raw_data_orig = dshs_table[0]
 
     raw_data_orig.columns
@@ -42,7 +48,7 @@ def fix_table_names(raw_df: pd.DataFrame) -> pd.DataFrame:
 
 
 def get_report_date(base_url: str) -> str:
-    page_response = requests.get(base_url)
+    page_response = src.http_client.get(base_url, cache_ttl=DSHS_CACHE_TTL)
     soup = BeautifulSoup(page_response.text, "html.parser")
     report_date: str = soup.find('b', string=re.compile('\d{1,2}/\d{1,2}/\d{4}')).text
 
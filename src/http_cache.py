@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = Path('data/cache/http')
+MAX_CACHE_BYTES = 1024 ** 3
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+# streamed bodies are copied to the cache file in chunks, ex the national usafacts + biobot files
+STREAM_CHUNK_BYTES = 1 << 20
+
+CACHE_LOCK = threading.Lock()
+# running size of the cached bodies, scanned once per process then kept up to date by store_response
+CACHE_BYTES = None
+
+
+def is_offline() -> bool:
+    # replay mode: every request must be served from the cache, ex HTTP_CACHE_OFFLINE=1 dagster dev
+    return os.getenv('HTTP_CACHE_OFFLINE', '').lower() in ['1', 'true', 'yes']
+
+
+def create_cache_key(prepared_request: requests.PreparedRequest) -> str:
+    body = prepared_request.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    key_prefix = f'{prepared_request.method} {prepared_request.url}\n'.encode('utf-8')
+    return hashlib.sha256(key_prefix + body).hexdigest()
+
+
+def get_paths(key: str) -> tuple[Path, Path]:
+    return CACHE_DIR / f'{key}.body', CACHE_DIR / f'{key}.json'
+
+
+def load_metadata(key: str) -> dict | None:
+    body_path, metadata_path = get_paths(key)
+    if not body_path.exists() or not metadata_path.exists():
+        return None
+    return json.loads(metadata_path.read_text())
+
+
+def is_fresh(metadata: dict, ttl: int) -> bool:
+    return time.time() - metadata['fetched_at'] < ttl
+
+
+def create_conditional_headers(metadata: dict) -> dict:
+    headers = {}
+    if metadata['headers'].get('ETag') is not None:
+        headers['If-None-Match'] = metadata['headers']['ETag']
+    if metadata['headers'].get('Last-Modified') is not None:
+        headers['If-Modified-Since'] = metadata['headers']['Last-Modified']
+    return headers
+
+
+def load_response(key: str, metadata: dict, stream: bool = False) -> requests.Response:
+    # streamed responses read the body from the cache file, response.raw is the open file
+    body_path, _ = get_paths(key)
+
+    response = requests.Response()
+    response.status_code = metadata['status_code']
+    response.url = metadata['url']
+    response.encoding = metadata['encoding']
+    response.headers = CaseInsensitiveDict(metadata['headers'])
+    if stream:
+        response.raw = body_path.open('rb')
+    else:
+        response._content = body_path.read_bytes()
+
+    # bump mtime so eviction treats this entry as recently used
+    body_path.touch()
+    return response
+
+
+def write_atomic(path: Path, content: bytes) -> None:
+    temp_path = path.with_suffix(f'{path.suffix}.{threading.get_ident()}.tmp')
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+
+
+def write_stream_atomic(path: Path, response: requests.Response) -> int:
+    # the body goes from the socket to disk a chunk at a time, returns the bytes written
+    temp_path = path.with_suffix(f'{path.suffix}.{threading.get_ident()}.tmp')
+    with temp_path.open('wb') as out:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+            out.write(chunk)
+    os.replace(temp_path, path)
+    return path.stat().st_size
+
+
+def store_response(key: str, response: requests.Response, stream: bool = False) -> dict:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    body_path, metadata_path = get_paths(key)
+
+    metadata = {
+        'method': response.request.method,
+        'url': response.url,
+        'status_code': response.status_code,
+        'encoding': response.encoding,
+        'headers': {header: response.headers[header] for header in CACHED_HEADERS if header in response.headers},
+        'fetched_at': time.time()
+    }
+
+    with CACHE_LOCK:
+        # the first store of a process scans before its own body is on disk
+        get_cache_bytes()
+    previous_bytes = body_path.stat().st_size if body_path.exists() else 0
+    if stream:
+        body_bytes = write_stream_atomic(body_path, response)
+    else:
+        write_atomic(body_path, response.content)
+        body_bytes = len(response.content)
+    write_atomic(metadata_path, json.dumps(metadata).encode('utf-8'))
+    add_cache_bytes(body_bytes - previous_bytes)
+    return metadata
+
+
+def mark_revalidated(key: str, metadata: dict) -> None:
+    _, metadata_path = get_paths(key)
+    metadata['fetched_at'] = time.time()
+    write_atomic(metadata_path, json.dumps(metadata).encode('utf-8'))
+
+
+def get_cache_bytes() -> int:
+    # callers hold CACHE_LOCK
+    global CACHE_BYTES
+    if CACHE_BYTES is None:
+        CACHE_BYTES = sum(path.stat().st_size for path in CACHE_DIR.glob('*.body'))
+    return CACHE_BYTES
+
+
+def add_cache_bytes(added_bytes: int, max_bytes: int = MAX_CACHE_BYTES) -> None:
+    # the directory is only scanned again once the running total goes over the limit
+    global CACHE_BYTES
+    with CACHE_LOCK:
+        CACHE_BYTES = get_cache_bytes() + added_bytes
+        if CACHE_BYTES > max_bytes:
+            evict(max_bytes)
+
+
+def evict(max_bytes: int = MAX_CACHE_BYTES) -> None:
+    # callers hold CACHE_LOCK, the scan also resets the running total
+    global CACHE_BYTES
+    body_paths = sorted(CACHE_DIR.glob('*.body'), key=lambda x: x.stat().st_mtime)
+    total_bytes = sum(path.stat().st_size for path in body_paths)
+
+    # least recently used first
+    for body_path in body_paths:
+        if total_bytes <= max_bytes:
+            break
+
+        total_bytes -= body_path.stat().st_size
+        body_path.unlink(missing_ok=True)
+        body_path.with_suffix('.json').unlink(missing_ok=True)
+
+    CACHE_BYTES = total_bytes
@@ -0,0 +1,160 @@
+# named http_client rather than http so scripts run from inside src/ don't shadow the stdlib http package
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import src.http_cache
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1
+POOL_SIZE = 16
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (10, 60)
+HOST_TIMEOUTS = {
+    'wabi-us-gov-iowa-api.analysis.usgovcloudapi.net': (10, 120),
+    'static.usafacts.org': (10, 300),
+}
+
+SESSIONS: dict[str, requests.Session] = {}
+SESSIONS_LOCK = threading.Lock()
+RETRY_COUNTS: dict[str, int] = defaultdict(int)
+CACHE_HIT_COUNTS: dict[str, int] = defaultdict(int)
+
+# arguments that shape the request itself (and so the cache key), the rest are passed to send
+REQUEST_ARGS = ['params', 'data', 'json', 'headers', 'cookies']
+
+
+class JitteredRetry(Retry):
+    # exponential backoff plus up to 100% jitter so concurrent pages don't retry in lockstep
+    def get_backoff_time(self) -> float:
+        backoff_time = super().get_backoff_time()
+        return backoff_time + random.uniform(0, backoff_time)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if _pool is not None:
+            RETRY_COUNTS[_pool.host] += 1
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def create_session() -> requests.Session:
+    retry = JitteredRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'POST', 'HEAD']),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    host = urlparse(url).netloc
+    with SESSIONS_LOCK:
+        if host not in SESSIONS:
+            SESSIONS[host] = create_session()
+    return SESSIONS[host]
+
+
+def get_timeout(url: str) -> tuple[int, int]:
+    return HOST_TIMEOUTS.get(urlparse(url).netloc, DEFAULT_TIMEOUT)
+
+
+def request(method: str, url: str, cache_ttl: int | None = 0, **kwargs) -> requests.Response:
+    # cache_ttl: seconds a cached response is served without revalidation, None skips the cache entirely
+    # stream=True responses never hold the body in memory: cached bodies are read from the cache file (response.raw)
+    kwargs.setdefault('timeout', get_timeout(url))
+    session = get_session(url)
+    stream = kwargs.get('stream', False)
+
+    if cache_ttl is None and not src.http_cache.is_offline():
+        return session.request(method, url, **kwargs)
+
+    request_kwargs = {arg: kwargs.pop(arg) for arg in REQUEST_ARGS if arg in kwargs}
+    prepared_request = session.prepare_request(requests.Request(method, url, **request_kwargs))
+    key = src.http_cache.create_cache_key(prepared_request)
+    metadata = src.http_cache.load_metadata(key)
+    host = urlparse(url).netloc
+
+    if src.http_cache.is_offline():
+        if metadata is None:
+            raise Exception(f'No cached response for {method} {url} in offline mode')
+        CACHE_HIT_COUNTS[host] += 1
+        return src.http_cache.load_response(key, metadata, stream=stream)
+
+    if metadata is not None and src.http_cache.is_fresh(metadata, cache_ttl):
+        CACHE_HIT_COUNTS[host] += 1
+        return src.http_cache.load_response(key, metadata, stream=stream)
+
+    if metadata is not None:
+        prepared_request.headers.update(src.http_cache.create_conditional_headers(metadata))
+
+    settings = session.merge_environment_settings(prepared_request.url, {}, None, None, None)
+    response = session.send(prepared_request, **{**settings, **kwargs})
+
+    if response.status_code == 304 and metadata is not None:
+        CACHE_HIT_COUNTS[host] += 1
+        response.close()
+        src.http_cache.mark_revalidated(key, metadata)
+        return src.http_cache.load_response(key, metadata, stream=stream)
+
+    if response.status_code == 200:
+        new_metadata = src.http_cache.store_response(key, response, stream=stream)
+        if stream:
+            response.close()
+            return src.http_cache.load_response(key, new_metadata, stream=True)
+
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def sleep_with_backoff(attempt: int, base_seconds: float = 2, max_seconds: float = 60) -> None:
+    # for failures that come back as a 200 with a bad body, which the adapter level retry can't see
+    backoff_time = min(base_seconds * 2 ** attempt, max_seconds)
+    time.sleep(backoff_time + random.uniform(0, backoff_time))
+
+
+def get_stats() -> dict:
+    stats = {}
+    with SESSIONS_LOCK:
+        sessions = dict(SESSIONS)
+
+    for host, session in sessions.items():
+        pools = session.get_adapter(f'https://{host}').poolmanager.pools
+        connection_pools = [pools[key] for key in pools.keys()]
+        num_requests = sum(pool.num_requests for pool in connection_pools)
+        num_connections = sum(pool.num_connections for pool in connection_pools)
+
+        stats[host] = {
+            'requests': num_requests,
+            'connections': num_connections,
+            'reused_connections': num_requests - num_connections,
+            'retries': RETRY_COUNTS[urlparse(f'https://{host}').hostname],
+            'cache_hits': CACHE_HIT_COUNTS[host]
+        }
+    return stats
+
+
+def print_stats() -> None:
+    for host, host_stats in get_stats().items():
+        print(f'{host}: {host_stats}')
@@ -0,0 +1,457 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime as dt
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from scipy import stats
+
+from src.utils import TMC_COUNTIES
+
+# time-dependent (Wallinga-Teunis) Rt, matches R0::estimate.R(methods='TD') with the same generation time
+GT_MEAN = 3.96
+GT_SD = 4.75
+MIN_RT_DATE = pd.Timestamp('2020-03-15')
+NSIM = 1000
+SIM_CHUNK_SIZE = 50
+CI_QUANTILES = [0.025, 0.975]
+
+# incremental runs re-estimate a trailing window per changed level, history is fully re-estimated once a week
+RT_CACHE_DIR = 'data/intermediate/rt/cache'
+RT_WINDOW_DAYS = 90
+RT_FULL_REFRESH_DAYS = 7
+LEVEL_COLS = ['Level_Type', 'Level']
+RT_INPUT_COLS = ['County', 'Date', 'cases_daily']
+
+# region prep --------------------------------------------------------------------------------
+def clean_county_vitals(county_vitals_raw: pd.DataFrame) -> pd.DataFrame:
+    county_vitals = (
+        county_vitals_raw
+        [RT_INPUT_COLS]
+        .drop_duplicates()
+        .rename(columns={'County': 'Level', 'cases_daily': 'Cases_Daily'})
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
+        .assign(Cases_Daily=lambda x: x['Cases_Daily'].astype(float))
+    )
+    return county_vitals
+
+
+def load_county_vitals(input_file: str) -> pd.DataFrame:
+    # only the columns Rt needs are decoded, straight from the memory mapped file
+    county_vitals_table = pq.read_table(input_file, columns=RT_INPUT_COLS, memory_map=True)
+    return clean_county_vitals(county_vitals_table.to_pandas(self_destruct=True, date_as_object=False))
+
+
+def combine_levels(county_vitals: pd.DataFrame) -> pd.DataFrame:
+    tmc_vitals = (
+        county_vitals
+        [county_vitals['Level'].isin(TMC_COUNTIES)]
+        .groupby('Date', as_index=False)
+        ['Cases_Daily']
+        .sum()
+        .assign(Level='TMC', Level_Type='TMC')
+    )
+
+    combined_df = pd.concat([county_vitals.assign(Level_Type='County'), tmc_vitals], axis=0)
+    return combined_df[['Level_Type', 'Level', 'Date', 'Cases_Daily']]
+
+
+def prepare_rt(case_df: pd.DataFrame) -> pd.DataFrame:
+    # daily grid per level, 7 day trailing average, trimmed to the first + last days with cases
+    daily_dates = pd.date_range(MIN_RT_DATE, case_df['Date'].max(), freq='D')
+    levels = case_df[['Level_Type', 'Level']].drop_duplicates()
+
+    daily_df = (
+        levels
+        .merge(pd.DataFrame({'Date': daily_dates}), how='cross')
+        .merge(case_df, on=['Level_Type', 'Level', 'Date'], how='left')
+        .assign(Cases_Daily=lambda x: x['Cases_Daily'].fillna(0))
+        .sort_values(['Level_Type', 'Level', 'Date'])
+        .reset_index(drop=True)
+    )
+
+    level_groups = daily_df.groupby(['Level_Type', 'Level'])
+    has_cases = daily_df['Cases_Daily'] > 0
+    after_first_case = has_cases.groupby([daily_df['Level_Type'], daily_df['Level']]).cummax()
+    through_last_case = (
+        has_cases[::-1]
+        .groupby([daily_df['Level_Type'][::-1], daily_df['Level'][::-1]])
+        .cummax()
+        [::-1]
+    )
+
+    prepared_df = (
+        daily_df
+        .assign(MA_7day=level_groups['Cases_Daily'].transform(lambda x: x.rolling(7).mean()))
+        [after_first_case & through_last_case]
+        .dropna(subset=['MA_7day'])
+        .reset_index(drop=True)
+    )
+    return prepared_df
+
+
+# endregion
+
+# region estimate --------------------------------------------------------------------------------
+def create_generation_time(mean: float = GT_MEAN, sd: float = GT_SD) -> np.ndarray:
+    # discretized gamma, mass at lag 0 set to 0, truncated at the 99.99th percentile (R0::generation.time)
+    shape = mean ** 2 / sd ** 2
+    scale = sd ** 2 / mean
+    t_max = int(np.ceil(stats.gamma.ppf(0.9999, shape, scale=scale)))
+
+    t_scale = np.concatenate([[0], 0.5 + np.arange(t_max + 1)])
+    generation_time = np.diff(stats.gamma.cdf(t_scale, shape, scale=scale))
+    generation_time[0] = 0
+    return generation_time / generation_time.sum()
+
+
+def create_level_array(prepared_df: pd.DataFrame, gt_length: int) -> tuple[np.ndarray, np.ndarray]:
+    # levels are laid end to end with a gap of gt_length zeros, so no infection can be attributed across levels
+    level_sizes = prepared_df.groupby(['Level_Type', 'Level'], sort=False).size().to_numpy()
+    level_starts = np.concatenate([[0], np.cumsum(level_sizes + gt_length)[:-1]])
+    positions = np.repeat(level_starts - np.concatenate([[0], np.cumsum(level_sizes)[:-1]]), level_sizes)
+    positions = positions + np.arange(prepared_df.shape[0])
+
+    incidence = np.zeros(positions[-1] + gt_length + 1)
+    incidence[positions] = prepared_df['MA_7day'].to_numpy()
+    return incidence, positions
+
+
+def create_infector_weights(incidence: np.ndarray, generation_time: np.ndarray) -> np.ndarray:
+    # weights[s, lag]: share of the cases on day s infected by the cases on day s - lag
+    n_days = incidence.shape[0]
+    lags = np.arange(generation_time.shape[0])
+    infector_index = np.arange(n_days)[:, None] - lags[None, :]
+
+    weights = np.where(
+        infector_index >= 0,
+        incidence[np.clip(infector_index, 0, None)] * generation_time[None, :],
+        0
+    )
+    weight_totals = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, weight_totals, out=np.zeros_like(weights), where=weight_totals > 0)
+
+
+def sum_by_infector(values: np.ndarray) -> np.ndarray:
+    # values[s, ..., lag] attributed to day s - lag, summed over s
+    output = np.zeros(values.shape[:-1])
+    for lag in range(1, values.shape[-1]):
+        output[:-lag] += values[lag:, ..., lag]
+    return output
+
+
+def create_correction(positions: np.ndarray, level_ends: np.ndarray, generation_time: np.ndarray) -> np.ndarray:
+    # share of each day's secondary cases that could have been observed before the level's last day
+    gt_cumulative = np.cumsum(generation_time)
+    days_remaining = np.clip(level_ends - positions, 0, generation_time.shape[0] - 1)
+    return gt_cumulative[days_remaining]
+
+
+def simulate_rt(incidence: np.ndarray, weights: np.ndarray, nsim: int, seed: int) -> np.ndarray:
+    # multinomial draws of each day's infectors, batched across every level + day, chunked over simulations
+    rng = np.random.default_rng(seed)
+    case_counts = np.floor(incidence).astype(np.int64)
+    has_infectors = weights.sum(axis=1) > 0
+    draw_days = np.flatnonzero(has_infectors & (case_counts > 0))
+
+    secondary_cases = np.zeros((incidence.shape[0], nsim), dtype=np.int64)
+    for chunk_start in range(0, nsim, SIM_CHUNK_SIZE):
+        chunk_size = min(SIM_CHUNK_SIZE, nsim - chunk_start)
+        draws = np.zeros((incidence.shape[0], chunk_size, weights.shape[1]), dtype=np.int32)
+        draws[draw_days] = rng.multinomial(
+            case_counts[draw_days, None],
+            weights[draw_days, None, :],
+            size=(draw_days.shape[0], chunk_size)
+        )
+        secondary_cases[:, chunk_start:chunk_start + chunk_size] = sum_by_infector(draws)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return secondary_cases / incidence[:, None]
+
+
+def estimate_rt(prepared_df: pd.DataFrame, nsim: int = NSIM, seed: int = 42) -> pd.DataFrame:
+    generation_time = create_generation_time()
+    incidence, positions = create_level_array(prepared_df, generation_time.shape[0])
+    level_ends = (
+        pd.Series(positions)
+        .groupby([prepared_df['Level_Type'], prepared_df['Level']], sort=False)
+        .transform('max')
+        .to_numpy()
+    )
+
+    weights = create_infector_weights(incidence, generation_time)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rt_raw = np.where(
+            incidence > 0,
+            sum_by_infector(incidence[:, None] * weights) / incidence,
+            0
+        )
+
+    rt_simulated = simulate_rt(incidence, weights, nsim, seed)[positions]
+    correction = create_correction(positions, level_ends, generation_time)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rt = rt_raw[positions] / correction
+        rt_simulated = rt_simulated / correction[:, None]
+
+    # days without cases (0 / 0) + the last day of each level, which has no observed secondary cases
+    has_simulations = np.isfinite(rt_simulated).all(axis=1) & (positions != level_ends)
+    rt_ci = np.full((positions.shape[0], 2), np.nan)
+    rt_ci[has_simulations] = np.quantile(rt_simulated[has_simulations], CI_QUANTILES, axis=1).T
+
+    rt_df = (
+        prepared_df
+        [['Level_Type', 'Level', 'Date']]
+        .assign(Rt=rt, lower=rt_ci[:, 0], upper=rt_ci[:, 1])
+        .assign(result_success=1.0)
+    )
+
+    # a 0 estimate means there were no cases to attribute, R0 reports it as missing
+    no_estimate = ~(rt_df['Rt'] > 0)
+    rt_df.loc[no_estimate, ['Rt', 'lower', 'upper']] = np.nan
+    return rt_df
+
+
+# endregion
+
+
+def format_rt_output(rt_df: pd.DataFrame) -> pd.DataFrame:
+    assert rt_df.query("Level == 'Bexar'")['Rt'].isnull().sum() < 10
+    assert not rt_df.duplicated(subset=['Level_Type', 'Level', 'Date']).any()
+
+    rt_df_out = (
+        rt_df
+        [rt_df['Date'] != rt_df['Date'].max()]
+        .sort_values(['Level_Type', 'Level', 'Date'])
+        .reset_index(drop=True)
+    )
+    return rt_df_out
+
+
+def calculate_rt(county_vitals: pd.DataFrame, nsim: int = NSIM, seed: int = 42) -> pd.DataFrame:
+    prepared_df = prepare_rt(combine_levels(county_vitals))
+
+    start_time = time.perf_counter()
+    rt_df = estimate_rt(prepared_df, nsim=nsim, seed=seed)
+    print(f'Estimated Rt for {prepared_df["Level"].nunique()} levels in {time.perf_counter() - start_time:.2f}s')
+
+    return format_rt_output(rt_df)
+
+
+# region incremental --------------------------------------------------------------------------------
+def hash_level_input(level_df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(level_df[['Date', 'MA_7day']], index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def create_level_key(level_type: str, level: str) -> str:
+    return f'{level_type}/{level}'
+
+
+def load_rt_cache(cache_dir: str) -> tuple[pd.DataFrame | None, pd.DataFrame | None, dict]:
+    metadata_path = Path(f'{cache_dir}/rt_cache.json')
+    if not metadata_path.exists():
+        return None, None, {}
+
+    metadata = json.loads(metadata_path.read_text())
+    run_dir = f'{cache_dir}/{metadata["run_dir"]}'
+
+    # uncompressed arrow ipc files, mapped rather than copied into memory
+    prepared_df = feather.read_table(f'{run_dir}/rt_input.feather', memory_map=True).to_pandas()
+    rt_df = feather.read_table(f'{run_dir}/rt_levels.feather', memory_map=True).to_pandas()
+    return prepared_df, rt_df, metadata
+
+
+def write_rt_cache(cache_dir: str, prepared_df: pd.DataFrame, rt_df: pd.DataFrame, metadata: dict) -> None:
+    # each run writes its own directory + swaps the pointer in rt_cache.json, so concurrent runs never see
+    # a partially written cache
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    run_dir = tempfile.mkdtemp(dir=cache_dir, prefix='run_')
+
+    feather.write_feather(prepared_df, f'{run_dir}/rt_input.feather', compression='uncompressed')
+    feather.write_feather(rt_df, f'{run_dir}/rt_levels.feather', compression='uncompressed')
+
+    previous_run_dir = metadata.get('run_dir')
+    temp_metadata_path = f'{run_dir}/rt_cache.json'
+    Path(temp_metadata_path).write_text(json.dumps({**metadata, 'run_dir': Path(run_dir).name}, indent=2))
+    os.replace(temp_metadata_path, f'{cache_dir}/rt_cache.json')
+
+    # the previous directory is kept for runs that read its pointer before the swap
+    for old_run_dir in Path(cache_dir).glob('run_*'):
+        if old_run_dir.name not in [Path(run_dir).name, previous_run_dir]:
+            shutil.rmtree(old_run_dir, ignore_errors=True)
+
+
+def find_first_change(level_df: pd.DataFrame, cached_level_df: pd.DataFrame) -> pd.Timestamp:
+    compare_df = level_df[['Date', 'MA_7day']].merge(
+        cached_level_df[['Date', 'MA_7day']],
+        on='Date',
+        how='outer',
+        suffixes=('', '_cached')
+    )
+    changed_dates = compare_df.loc[compare_df['MA_7day'] != compare_df['MA_7day_cached'], 'Date']
+    return changed_dates.min()
+
+
+def find_window_start(level_df: pd.DataFrame, cached_level_df: pd.DataFrame, window_days: int,
+                      gt_length: int) -> pd.Timestamp | None:
+    # an estimate depends on the gt_length days on either side of it, plus the level's last day for the correction,
+    # so history is only frozen if every change + the previous last day fall inside the window
+    window_start = level_df['Date'].max() - pd.Timedelta(days=window_days)
+    earliest_safe_change = window_start + pd.Timedelta(days=gt_length)
+
+    if level_df['Date'].min() != cached_level_df['Date'].min():
+        return None
+
+    if find_first_change(level_df, cached_level_df) < earliest_safe_change:
+        return None
+
+    if cached_level_df['Date'].max() < earliest_safe_change:
+        return None
+
+    return window_start
+
+
+def needs_full_refresh(metadata: dict, full_refresh_days: int) -> bool:
+    if 'last_full_refresh' not in metadata:
+        return True
+
+    days_since_refresh = (dt.now() - dt.fromisoformat(metadata['last_full_refresh'])).days
+    return days_since_refresh >= full_refresh_days
+
+
+def calculate_rt_incremental(county_vitals: pd.DataFrame, cache_dir: str = RT_CACHE_DIR,
+                             window_days: int = RT_WINDOW_DAYS, full_refresh: bool = False,
+                             nsim: int = NSIM, seed: int = 42) -> pd.DataFrame:
+    prepared_df = prepare_rt(combine_levels(county_vitals))
+    cached_prepared_df, cached_rt_df, metadata = load_rt_cache(cache_dir)
+
+    full_refresh = full_refresh or cached_rt_df is None or needs_full_refresh(metadata, RT_FULL_REFRESH_DAYS)
+    gt_length = create_generation_time().shape[0]
+
+    frozen_rt_list = []
+    estimate_input_list = []
+    estimate_starts = {}
+    level_hashes = {}
+    for (level_type, level), level_df in prepared_df.groupby(LEVEL_COLS, sort=False):
+        level_key = create_level_key(level_type, level)
+        level_hashes[level_key] = hash_level_input(level_df)
+
+        if full_refresh or level_key not in metadata['level_hashes']:
+            estimate_input_list.append(level_df)
+            estimate_starts[(level_type, level)] = level_df['Date'].min()
+            continue
+
+        is_cached_level = (cached_rt_df['Level_Type'] == level_type) & (cached_rt_df['Level'] == level)
+        if level_hashes[level_key] == metadata['level_hashes'][level_key]:
+            frozen_rt_list.append(cached_rt_df[is_cached_level])
+            continue
+
+        is_cached_input = (cached_prepared_df['Level_Type'] == level_type) & (cached_prepared_df['Level'] == level)
+        window_start = find_window_start(level_df, cached_prepared_df[is_cached_input], window_days, gt_length)
+
+        if window_start is None:
+            print(f'{level_key}: changed outside of the {window_days} day window, re-estimating full history')
+            estimate_input_list.append(level_df)
+            estimate_starts[(level_type, level)] = level_df['Date'].min()
+            continue
+
+        # the days before the window only seed the estimates inside it
+        print(f'{level_key}: re-estimating from {window_start.date()}')
+        estimate_input_list.append(level_df[level_df['Date'] >= window_start - pd.Timedelta(days=gt_length)])
+        estimate_starts[(level_type, level)] = window_start
+        cached_level_rt = cached_rt_df[is_cached_level]
+        frozen_rt_list.append(cached_level_rt[cached_level_rt['Date'] < window_start])
+
+    estimated_rt_list = []
+    if estimate_input_list:
+        estimate_input = pd.concat(estimate_input_list, axis=0).reset_index(drop=True)
+
+        start_time = time.perf_counter()
+        estimated_rt = estimate_rt(estimate_input, nsim=nsim, seed=seed)
+        print(f'Estimated Rt over {estimate_input.shape[0]} level days in {time.perf_counter() - start_time:.2f}s')
+
+        estimate_starts_df = pd.DataFrame(
+            [(*level, start_date) for level, start_date in estimate_starts.items()],
+            columns=LEVEL_COLS + ['estimate_start']
+        )
+        estimated_rt_list.append(
+            estimated_rt
+            .merge(estimate_starts_df, on=LEVEL_COLS, how='left')
+            .query('Date >= estimate_start')
+            .drop(columns=['estimate_start'])
+        )
+
+    rt_df = (
+        pd.concat(frozen_rt_list + estimated_rt_list, axis=0)
+        .sort_values(LEVEL_COLS + ['Date'])
+        .reset_index(drop=True)
+    )
+
+    new_metadata = {
+        'run_dir': metadata.get('run_dir'),
+        'level_hashes': level_hashes,
+        'last_full_refresh': dt.now().isoformat() if full_refresh else metadata['last_full_refresh']
+    }
+    write_rt_cache(cache_dir, prepared_df, rt_df, new_metadata)
+    return format_rt_output(rt_df)
+
+
+# endregion
+
+
+# region diagnostics --------------------------------------------------------------------------------
+def check_parity(rt_df: pd.DataFrame, reference_file: str, rt_tolerance: float = 0.005,
+                 ci_tolerance: float = 0.02) -> pd.DataFrame:
+    # point estimates are deterministic, the intervals are simulated so only their typical difference is checked
+    # the reference holds date32 (or string) dates, both sides are compared as datetime64
+    reference_df = (
+        pq.read_table(reference_file).to_pandas(date_as_object=False)
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
+    )
+    compare_df = reference_df.merge(
+        rt_df.assign(Date=lambda x: pd.to_datetime(x['Date'])),
+        on=['Level_Type', 'Level', 'Date'],
+        how='outer',
+        suffixes=('_reference', ''),
+        indicator=True
+    )
+    assert (compare_df['_merge'] == 'both').all(), 'Rt levels + dates differ from the reference'
+
+    summary = []
+    for col in ['Rt', 'lower', 'upper']:
+        assert (compare_df[col].isnull() == compare_df[f'{col}_reference'].isnull()).all(), f'{col} missing values differ'
+
+        relative_diff = (
+            (compare_df[col] - compare_df[f'{col}_reference']).abs()
+            / compare_df[f'{col}_reference'].abs()
+        ).replace(np.inf, np.nan)
+        summary.append({'col': col, 'median_diff': relative_diff.median(), 'max_diff': relative_diff.max()})
+
+    summary_df = pd.DataFrame(summary).set_index('col')
+    assert summary_df.loc['Rt', 'max_diff'] < rt_tolerance, summary_df
+    assert summary_df.loc[['lower', 'upper'], 'median_diff'].max() < ci_tolerance, summary_df
+    return summary_df
+
+
+def main():
+    county_vitals = load_county_vitals('data/tableau/county_vitals.parquet')
+    rt_df = calculate_rt(county_vitals)
+
+    parity_summary = check_parity(rt_df, 'data/intermediate/rt/rt_all.parquet')
+    print('Rt matches the R0 reference output')
+    print(parity_summary.to_string())
+
+
+# endregion
+
+
+if __name__ == '__main__':
+    main()
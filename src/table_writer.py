@@ -0,0 +1,190 @@
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+# a dataframe is converted to arrow once, then every output format is written from that table in its own thread
+# the arrow writers release the gil, so the formats serialize concurrently
+CSV_BATCH_SIZE = 64_000
+
+
+def create_arrow_table(df: pd.DataFrame) -> pa.Table:
+    return cast_dates(pa.Table.from_pandas(df, preserve_index=False))
+
+
+def cast_dates(table: pa.Table) -> pa.Table:
+    # timestamps that are all midnight are stored as date32, dates stay datetime64 in pandas and are read back
+    # with date_as_object=False, ex 2023-08-16 in the csv instead of 2023-08-16 00:00:00.000000000
+    for position, field in enumerate(table.schema):
+        if not pa.types.is_timestamp(field.type):
+            continue
+        col = table.column(position)
+        if pc.all(pc.equal(pc.floor_temporal(col, unit='day'), col)).as_py() in [True, None]:
+            table = table.set_column(position, field.name, pc.cast(col, pa.date32()))
+    return table
+
+
+def write_parquet(table: pa.Table, file_path: str) -> None:
+    pq.write_table(table, file_path)
+
+
+# DataFrame.to_csv switches floats to exponents below 1e-4 + from 1e16, arrow has its own cutoffs
+PYTHON_FLOAT_MIN = 1e-4
+PYTHON_FLOAT_MAX = 1e16
+CSV_SPECIAL_CHARS = r'[,"\r\n]'
+
+
+def format_csv_float(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # same text as DataFrame.to_csv: whole floats keep their .0 (arrow writes 1.0 as 1), exponents where python
+    # puts them, the few values arrow formats differently are formatted by python
+    text = pc.cast(col, pa.string())
+    text = pc.if_else(pc.match_substring_regex(text, r'^-?\d+$'), pc.binary_join_element_wise(text, '.0', ''), text)
+
+    abs_values = pc.abs(col)
+    is_python_format = pc.or_(
+        pc.match_substring(text, 'e'),
+        pc.or_(
+            pc.and_(pc.less(abs_values, PYTHON_FLOAT_MIN), pc.not_equal(abs_values, 0)),
+            pc.and_(pc.greater_equal(abs_values, PYTHON_FLOAT_MAX), pc.is_finite(abs_values))
+        )
+    )
+    if not pc.any(is_python_format).as_py():
+        return text
+
+    python_text = text.to_numpy()
+    positions = pc.indices_nonzero(pc.fill_null(is_python_format, False)).to_numpy()
+    values = col.to_numpy()
+    python_text[positions] = [str(x) for x in values[positions]]
+    return pa.chunked_array([pa.array(python_text, type=pa.string())])
+
+
+def create_csv_table(table: pa.Table) -> pa.Table:
+    for position, field in enumerate(table.schema):
+        col = table.column(position)
+        if pa.types.is_floating(field.type):
+            table = table.set_column(position, field.name, format_csv_float(col))
+        elif pa.types.is_boolean(field.type):
+            table = table.set_column(position, field.name, pc.if_else(col, 'True', 'False'))
+    return table
+
+
+def needs_quoting(table: pa.Table) -> bool:
+    # ex a comma in a plant name, categories are checked on their dictionary
+    for field, col in zip(table.schema, table.columns):
+        for chunk in col.chunks:
+            values = chunk.dictionary if pa.types.is_dictionary(field.type) else chunk
+            if pa.types.is_string(values.type) and pc.any(pc.match_substring_regex(values, CSV_SPECIAL_CHARS)).as_py():
+                return True
+    return False
+
+
+def create_csv_header(table: pa.Table) -> bytes:
+    # arrow quotes every header name, the header line is written the pandas way before arrow writes the rows
+    header = io.StringIO()
+    csv.writer(header, lineterminator='\n').writerow(table.column_names)
+    return header.getvalue().encode('utf-8')
+
+
+def write_csv_rows(table: pa.Table, out: pa.NativeFile) -> None:
+    # pyarrow 12 has no minimal quoting like pandas: 'needed' quotes every string, 'none' quotes nothing but rejects
+    # values with a delimiter, quote or newline, those tables fall back to quoting every string
+    csv_table = create_csv_table(table)
+    write_options = pcsv.WriteOptions(
+        include_header=False,
+        batch_size=CSV_BATCH_SIZE,
+        quoting_style='needed' if needs_quoting(csv_table) else 'none'
+    )
+    out.write(create_csv_header(csv_table))
+    pcsv.write_csv(csv_table, out, write_options=write_options)
+
+
+def write_csv(table: pa.Table, file_path: str) -> None:
+    with pa.OSFile(file_path, 'wb') as out:
+        write_csv_rows(table, out)
+
+
+def write_csv_gz(table: pa.Table, file_path: str) -> None:
+    with pa.CompressedOutputStream(file_path, 'gzip') as out:
+        write_csv_rows(table, out)
+
+
+FORMAT_WRITERS = {
+    'parquet': write_parquet,
+    'csv': write_csv,
+    'csv.gz': write_csv_gz,
+}
+
+
+def write_format(table: pa.Table, file_format: str, file_path: str) -> dict:
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    FORMAT_WRITERS[file_format](table, file_path)
+    return {'path': file_path, 'bytes': Path(file_path).stat().st_size, 'seconds': time.perf_counter() - start}
+
+
+def write_table(df: pd.DataFrame, outputs: dict[str, str]) -> dict:
+    # outputs maps a format to its path, ex {'parquet': 'data/tableau/rt.parquet', 'csv': 'tableau/post_emergency/rt.csv'}
+    unknown_formats = [x for x in outputs if x not in FORMAT_WRITERS]
+    assert not unknown_formats, f'unknown formats {unknown_formats}, expected one of {list(FORMAT_WRITERS)}'
+
+    start = time.perf_counter()
+    table = create_arrow_table(df)
+    arrow_seconds = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        futures = {
+            file_format: executor.submit(write_format, table, file_format, file_path)
+            for file_format, file_path in outputs.items()
+        }
+        write_stats = {file_format: future.result() for file_format, future in futures.items()}
+
+    return {'arrow': {'seconds': arrow_seconds}, **write_stats}
+
+
+def flatten_write_stats(write_stats: dict) -> dict:
+    # ex {'csv': {'bytes': 10, 'seconds': 0.1}} -> {'csv_bytes': 10, 'csv_seconds': 0.1}, for dagster output metadata
+    return {
+        f'{file_format}_{stat}': value
+        for file_format, stats in write_stats.items()
+        for stat, value in stats.items()
+        if stat != 'path'
+    }
+
+
+def main():
+    # serializing each tableau table through pandas twice vs once through arrow
+    for table_name in ['county_vitals', 'rt', 'state_vitals', 'wastewater', 'wastewater_plant']:
+        df = pd.read_parquet(f'data/tableau/{table_name}.parquet')
+        out_dir = f'data/cache/table_writer/{table_name}'
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        df.to_parquet(f'{out_dir}/{table_name}.parquet', index=False)
+        df.to_csv(f'{out_dir}/{table_name}.csv', index=False)
+        pandas_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_stats = write_table(
+            df,
+            {
+                'parquet': f'{out_dir}/{table_name}.parquet',
+                'csv': f'{out_dir}/{table_name}.csv',
+                'csv.gz': f'{out_dir}/{table_name}.csv.gz'
+            }
+        )
+        arrow_seconds = time.perf_counter() - start
+
+        print(f'{table_name}: pandas parquet + csv {pandas_seconds:.3f}s, arrow parquet + csv + csv.gz {arrow_seconds:.3f}s')
+        for file_format, stats in write_stats.items():
+            print(f'    {file_format}: {stats}')
+
+
+if __name__ == '__main__':
+    main()
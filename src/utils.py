@@ -1,7 +1,26 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+import hashlib
+import io
+import os
+import requests
+import urllib3
 from datetime import datetime as dt
 from datetime import timedelta
-import subprocess
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+
+# national source files are decoded one block at a time + filtered before anything is converted to pandas
+CSV_BLOCK_SIZE = 4 << 20
+
+# the texas medical center's counties, rolled up into the TMC level by rt + the wastewater aggregates
+TMC_COUNTIES = [
+    'Austin', 'Brazoria', 'Chambers', 'Fort Bend', 'Galveston',
+    'Harris', 'Liberty', 'Montgomery', 'Waller'
+]
 
 
 def write_file(df: pd.DataFrame, table_path: str, add_date: bool = True) -> None:
@@ -19,46 +38,21 @@ def load_csv(url: str, skip_rows: int = 0) -> pd.DataFrame:
 
 
 def load_parquet(url: str) -> pd.DataFrame:
-    return pd.read_parquet(url)
+    # date32 columns come back as datetime64 instead of python date objects
+    return pq.read_table(url).to_pandas(date_as_object=False)
 
 
 def convert_date(date_series: pd.Series, date_format: str) -> pd.Series:
+    # dates repeat across counties + metrics, so each distinct value is parsed once and broadcast back
+    # returns datetime64 at midnight, python dates are only created by the pandera coerce at validation
+    codes, uniques = pd.factorize(date_series)
     if date_format == 'timestamp_int':
-        return pd.to_datetime(date_series * 1_000_000).dt.date
-
-    return pd.to_datetime(date_series, format=date_format).dt.date
-
-
-# TODO: generalize config args
-def run_r_script(config: dict) -> bool:
-    # https://stackoverflow.com/questions/62716500/call-and-execute-an-r-script-from-python
-    print(f'Running R script: {config["script_path"]}')
-    try:
-        p = subprocess.Popen(
-            ["Rscript",
-             config['arg'],
-             config['script_path'],
-             config['input_file'],
-             config['output_file']
-             ],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-
-        output, error = p.communicate()
-
-        if p.returncode == 0:
-            print('R OUTPUT:\n {0}'.format(output.decode("utf-8")))
-        else:
-            print('R ERROR:\n {0}'.format(error.decode("utf-8")))
-
-        return True
-
-    except Exception as e:
-        print(e)
+        parsed = pd.to_datetime(uniques, unit='ms')
+    else:
+        parsed = pd.to_datetime(uniques, format=date_format)
 
-        return False
+    dates = pd.Series(parsed.normalize().values[codes], index=date_series.index, name=date_series.name)
+    return dates.where(codes != -1)
 
 
 def union_df_list(df_list: list) -> pd.DataFrame:
@@ -73,3 +67,101 @@ def union_df_list(df_list: list) -> pd.DataFrame:
 def filter_df_date(df: pd.DataFrame, days: int = 14) -> pd.DataFrame:
     min_date = max(df['Date']) - timedelta(days=days)
     return df.query("Date >= @min_date")
+
+
+# region streaming csv --------------------------------------------------------------------------------
+def open_response_body(response: requests.Response) -> pa.NativeFile | BinaryIO:
+    # for src.http_client.get(..., stream=True): cached bodies are read from the cache file, uncached ones off the
+    # socket as the csv reader asks for the next block, responses without a raw body are already in memory
+    if response.raw is None:
+        return pa.BufferReader(response.content)
+    if isinstance(response.raw, urllib3.response.HTTPResponse):
+        response.raw.decode_content = True
+    return response.raw
+
+
+class HashingReader(io.RawIOBase):
+    # hashes a body as it's read, ex the sha256 of a streamed report once the csv reader reaches the end
+    def __init__(self, body: BinaryIO):
+        self.body = body
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        self.sha256.update(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.body.close()
+        super().close()
+
+
+def create_state_predicate(state_col: str, state_abbr: str = 'TX') -> Callable[[pa.RecordBatch], pa.Array]:
+    return lambda batch: pc.equal(batch.column(state_col), state_abbr)
+
+
+def stream_csv_batches(body: bytes | pa.NativeFile | BinaryIO, predicate: Callable[[pa.RecordBatch], pa.Array],
+                       columns: list[str] | None = None, column_types: dict | None = None,
+                       skip_rows: int = 0) -> Iterator[pa.RecordBatch]:
+    # yields only the rows the predicate keeps, ex create_state_predicate('State') for texas rows
+    reader = pcsv.open_csv(
+        pa.BufferReader(body) if isinstance(body, bytes) else body,
+        read_options=pcsv.ReadOptions(skip_rows=skip_rows, block_size=CSV_BLOCK_SIZE),
+        convert_options=pcsv.ConvertOptions(include_columns=columns or [], column_types=column_types or {})
+    )
+    for batch in reader:
+        yield batch.filter(predicate(batch))
+
+
+def read_csv_table(body: bytes | pa.NativeFile | BinaryIO, predicate: Callable[[pa.RecordBatch], pa.Array],
+                   columns: list[str] | None = None, column_types: dict | None = None,
+                   skip_rows: int = 0) -> tuple[pa.Table | None, dict]:
+    # peak_bytes is the most arrow memory held at once while reading: the kept batches + the block being decoded
+    # (the pool is process wide, so concurrent reads count each other's blocks)
+    memory_pool = pa.default_memory_pool()
+    start_bytes = memory_pool.bytes_allocated()
+    peak_bytes = 0
+
+    batches = []
+    for batch in stream_csv_batches(body, predicate, columns, column_types, skip_rows):
+        batches.append(batch)
+        peak_bytes = max(peak_bytes, memory_pool.bytes_allocated() - start_bytes)
+
+    if not batches:
+        return None, {'rows': 0, 'peak_bytes': peak_bytes, 'table_bytes': 0}
+
+    table = pa.Table.from_batches(batches)
+    return table, {'rows': table.num_rows, 'peak_bytes': peak_bytes, 'table_bytes': table.nbytes}
+
+
+def read_csv_filtered(body: bytes | pa.NativeFile | BinaryIO, predicate: Callable[[pa.RecordBatch], pa.Array],
+                      columns: list[str] | None = None, column_types: dict | None = None,
+                      skip_rows: int = 0) -> tuple[pd.DataFrame, dict]:
+    table, read_stats = read_csv_table(body, predicate, columns, column_types, skip_rows)
+    if table is None:
+        return pd.DataFrame(columns=columns), read_stats
+    return table.to_pandas(), read_stats
+
+
+# endregion
+
+
+# region pending state --------------------------------------------------------------------------------
+# incremental state (ex group hashes) describes an output, so the asset writes it to a pending path and the io manager
+# swaps it in once the output is saved, a failed write leaves the previous state, ex metadata={'state_paths': [HASH_PATH]}
+def create_pending_path(path: str) -> str:
+    return f'{path}.pending'
+
+
+def commit_pending_paths(paths: list[str]) -> None:
+    for path in paths:
+        pending_path = create_pending_path(path)
+        if Path(pending_path).exists():
+            os.replace(pending_path, path)
+
+
+# endregion
@@ -1,7 +1,162 @@
+import time
+
+import numpy as np
 import pandas as pd
+
+import src.aggregation
 import src.utils
 
+WW_METRICS = [
+    'normalized_levels_15d',
+    'normalized_levels_pct_difference_15d',
+    'pct_samples_with_detectable_levels_15d'
+]
+WEIGHT_COL = 'population_served'
+
+# incremental runs keep one hash per (County, Date) of its plant level rows, groups whose hash changed are dirty
+GROUP_COLS = ['County', 'Date']
+HASH_COLS = GROUP_COLS + ['key_plot_id', WEIGHT_COL] + WW_METRICS
+LEVEL_ORDER = {'County': 0, 'TMC': 1, 'State': 2}
+
+
 def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
+    # population weighted means per county, the tmc region + the state, in one pass
+    levels = src.aggregation.create_texas_levels(df['County'])
+    return src.aggregation.weighted_means(df, WW_METRICS, WEIGHT_COL, levels)
+
+
+def run_diagnostics(df: pd.DataFrame) -> None:
+    check_no_nulls = df.isnull().sum().sum()
+    assert check_no_nulls == 0, 'Null values found'
+
+
+# region incremental --------------------------------------------------------------------------------
+def sort_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        df
+        .sort_values(
+            by=src.aggregation.LEVEL_COLS + ['Date'],
+            key=lambda x: x.map(LEVEL_ORDER) if x.name == 'Level_Type' else x
+        )
+        .reset_index(drop=True)
+    )
+
+
+def create_group_hashes(df: pd.DataFrame) -> pd.DataFrame:
+    # the row hashes of a group are summed (mod 2^64), so the group hash doesn't depend on row order
+    row_hashes = pd.util.hash_pandas_object(df[HASH_COLS], index=False).to_numpy()
+    county_codes, _ = pd.factorize(df['County'])
+    date_codes, dates = pd.factorize(df['Date'])
+    group_codes = county_codes.astype(np.int64) * len(dates) + date_codes
+
+    order = np.argsort(group_codes, kind='stable')
+    sorted_codes = group_codes[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    return (
+        df[GROUP_COLS]
+        .iloc[order[group_starts]]
+        .reset_index(drop=True)
+        .assign(group_hash=np.add.reduceat(row_hashes[order], group_starts))
+    )
+
+
+def find_dirty_groups(group_hashes: pd.DataFrame, previous_hashes: pd.DataFrame) -> pd.DataFrame:
+    # new, changed + removed groups
+    merged_hashes = group_hashes.merge(
+        previous_hashes,
+        on=GROUP_COLS,
+        how='outer',
+        suffixes=('', '_previous'),
+        indicator=True
+    )
+    is_dirty = (
+        (merged_hashes['_merge'] != 'both')
+        | (merged_hashes['group_hash'] != merged_hashes['group_hash_previous'])
+    )
+    return merged_hashes.loc[is_dirty, GROUP_COLS].reset_index(drop=True)
+
+
+def aggregate_incremental(clean_df: pd.DataFrame, existing_df: pd.DataFrame | None,
+                          previous_hashes: pd.DataFrame | None) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    # only dirty groups are re-aggregated + upserted into the existing aggregate
+    group_hashes = create_group_hashes(clean_df)
+    if existing_df is None or previous_hashes is None:
+        stats = {
+            'dirty_groups': group_hashes.shape[0],
+            'dirty_dates': clean_df['Date'].nunique(),
+            'rows_aggregated': clean_df.shape[0]
+        }
+        return sort_aggregate(aggregate_data(clean_df)), group_hashes, stats
+
+    dirty_groups = find_dirty_groups(group_hashes, previous_hashes)
+    if dirty_groups.shape[0] == 0:
+        return existing_df, group_hashes, {'dirty_groups': 0, 'dirty_dates': 0, 'rows_aggregated': 0}
+
+    dirty_dates = dirty_groups['Date'].unique()
+    dirty_levels = dirty_groups.rename(columns={'County': 'Level'}).assign(is_dirty=True)
+
+    def is_in_dirty_groups(df: pd.DataFrame) -> np.ndarray:
+        # only county rows at a dirty date can be in a dirty group, the rest skip the merge
+        is_candidate = ((df['Level_Type'] == 'County') & df['Date'].isin(dirty_dates)).to_numpy()
+        is_dirty = np.zeros(df.shape[0], dtype=bool)
+        is_dirty[is_candidate] = (
+            df.loc[is_candidate, ['Level', 'Date']]
+            .merge(dirty_levels, how='left', on=['Level', 'Date'])
+            ['is_dirty'].notnull()
+            .to_numpy()
+        )
+        return is_dirty
+
+    # every county at a dirty date is re-read, the tmc + state means of that date depend on all of them
+    date_df = clean_df[clean_df['Date'].isin(dirty_dates)]
+    recomputed_df = aggregate_data(date_df)
+    is_recomputed = (recomputed_df['Level_Type'] != 'County').to_numpy() | is_in_dirty_groups(recomputed_df)
+    recomputed_df = recomputed_df[is_recomputed]
+
+    # removed groups + dates drop out, they're replaced without being recomputed
+    is_replaced = is_in_dirty_groups(existing_df) | (
+        (existing_df['Level_Type'] != 'County') & existing_df['Date'].isin(dirty_dates)
+    ).to_numpy()
+    aggregated_df = sort_aggregate(pd.concat([existing_df[~is_replaced], recomputed_df], ignore_index=True))
+
+    stats = {
+        'dirty_groups': dirty_groups.shape[0],
+        'dirty_dates': len(dirty_dates),
+        'rows_aggregated': date_df.shape[0]
+    }
+    return aggregated_df, group_hashes, stats
+
+
+def diff_aggregates(incremental_df: pd.DataFrame, full_df: pd.DataFrame) -> dict:
+    # full rebuild vs incremental, rows missing on either side + rows whose metrics differ
+    merged_df = incremental_df.merge(
+        full_df,
+        on=src.aggregation.LEVEL_COLS + ['Date'],
+        how='outer',
+        suffixes=('_incremental', '_full'),
+        indicator=True
+    )
+    is_both = merged_df['_merge'] == 'both'
+    is_mismatched = np.zeros(merged_df.shape[0], dtype=bool)
+    for metric in WW_METRICS:
+        is_mismatched |= ~np.isclose(
+            merged_df[f'{metric}_incremental'].to_numpy(dtype='float64'),
+            merged_df[f'{metric}_full'].to_numpy(dtype='float64'),
+            equal_nan=True
+        )
+
+    return {
+        'only_incremental': int((merged_df['_merge'] == 'left_only').sum()),
+        'only_full': int((merged_df['_merge'] == 'right_only').sum()),
+        'mismatched': int((is_both & is_mismatched).sum())
+    }
+
+
+# endregion
+
+
+# region legacy implementation kept as the reference --------------------------------------------------------------------------------
+def aggregate_data_legacy(df: pd.DataFrame) -> pd.DataFrame:
     def weighted_average(df, data_col):
         # https://stackoverflow.com/questions/31521027/groupby-weighted-average-and-sum-in-pandas-dataframe/31521177#31521177
         weight_col = 'population_served'
@@ -14,9 +169,7 @@ def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
         del df['_data_times_weight'], df['_weight_where_notnull']
         return result
 
-    ww_metrics = ['normalized_levels_15d', 'normalized_levels_pct_difference_15d',
-                  'pct_samples_with_detectable_levels_15d']
-    aggregations = {metric: weighted_average(df, metric) for metric in ww_metrics}
+    aggregations = {metric: weighted_average(df, metric) for metric in WW_METRICS}
 
     aggregated_df = (
         pd.DataFrame.from_records(aggregations)
@@ -26,24 +179,41 @@ def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
     return aggregated_df
 
 
-def run_diagnostics(df: pd.DataFrame) -> None:
-    check_no_nulls = df.isnull().sum().sum()
-    assert check_no_nulls == 0, 'Null values found'
+# endregion
 
 
-# region setup --------------------------------------------------------------------------------
-current_agg_df = src.utils.load_csv('tableau/wastewater/cdc_wastewater_aggregated.csv')
-clean_df = src.utils.load_csv('tableau/wastewater/cdc_wastewater.csv')
-# endregion
+def main():
+    clean_df = src.utils.load_parquet('data/origin/wastewater/cdc_wastewater.parquet')
 
-# region calc + combine --------------------------------------------------------------------------------
-aggregated_df = aggregate_data(clean_df)
+    for scale in [1, 50]:
+        # extra counties keep the same dates + plants, ex Harris_3
+        scaled_df = pd.concat(
+            [clean_df.assign(County=clean_df['County'] + f'_{i}') for i in range(scale)],
+            ignore_index=True
+        ) if scale > 1 else clean_df
 
-aggregate_df_out = pd.concat([current_agg_df, aggregated_df]).drop_duplicates()
-aggregate_df_out = aggregated_df
-# endregion
+        start = time.perf_counter()
+        legacy_df = aggregate_data_legacy(scaled_df.copy())
+        legacy_seconds = time.perf_counter() - start
 
-# region  --------------------------------------------------------------------------------
-run_diagnostics(aggregate_df_out)
-src.utils.write_file(aggregate_df_out, 'tableau/wastewater/cdc_wastewater_aggregated')
-# endregion
+        start = time.perf_counter()
+        aggregated_df = aggregate_data(scaled_df)
+        seconds = time.perf_counter() - start
+
+        county_df = (
+            aggregated_df
+            .query("Level_Type == 'County'")
+            .rename(columns={'Level': 'County'})
+            [['County', 'Date'] + WW_METRICS]
+            .reset_index(drop=True)
+        )
+        pd.testing.assert_frame_equal(county_df, legacy_df[['County', 'Date'] + WW_METRICS], check_dtype=False)
+
+        print(
+            f'{scaled_df.shape[0]} rows: legacy county only {legacy_seconds:.4f}s, '
+            f'county + tmc + state {seconds:.4f}s ({aggregated_df.shape[0]} rows)'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,31 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime as dt
+from pathlib import Path
+from typing import BinaryIO
+
 import pandas as pd
+import pyarrow as pa
 
+import src.http_client
 import src.utils
 
+# weekly reports don't change once published
+BIOBOT_CACHE_TTL = 7 * 24 * 60 * 60
+
+# backfills fetch reports concurrently, every ingested report date is kept in the manifest with its content hash
+MANIFEST_PATH = 'data/origin/wastewater/biobot_manifest.json'
+MAX_WORKERS = 8
+STATE_ABBR = 'TX'
+REPORT_COLUMN_TYPES = {
+    'state_abbr': pa.string(),
+    'display_name': pa.string(),
+    'date': pa.string(),
+    'eff_conc_sarscov2_weekly': pa.float64(),
+    'eff_conc_sarscov2_weekly_rolling': pa.float64(),
+}
+
 
 def obtain_urls(num_reports: int = 1) -> dict:
     url_prefix = 'https://d1t7q96h7r5kqm.cloudfront.net/'
@@ -21,6 +44,121 @@ def obtain_urls(num_reports: int = 1) -> dict:
     return output
 
 
+def get_report(url: str) -> pd.DataFrame:
+    # every column of the texas rows, the raw report is written as is
+    response = src.http_client.get(url, cache_ttl=BIOBOT_CACHE_TTL, stream=True)
+    response.raise_for_status()
+    with src.utils.open_response_body(response) as body:
+        report_df, read_stats = src.utils.read_csv_filtered(
+            body,
+            src.utils.create_state_predicate('state_abbr', STATE_ABBR),
+            column_types=REPORT_COLUMN_TYPES,
+            skip_rows=1
+        )
+    print(f'{url}: {read_stats}')
+    return report_df
+
+
+# region backfill --------------------------------------------------------------------------------
+def load_manifest(manifest_path: str = MANIFEST_PATH) -> dict:
+    if not Path(manifest_path).exists():
+        return {'reports': {}}
+    return json.loads(Path(manifest_path).read_text())
+
+
+def write_manifest(manifest: dict, manifest_path: str = MANIFEST_PATH) -> None:
+    Path(manifest_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(manifest_path).write_text(json.dumps(manifest, indent=2))
+
+
+def read_state_rows(body: bytes | BinaryIO, state_abbr: str = STATE_ABBR) -> pd.DataFrame:
+    # only the state's rows + the columns clean_data uses are converted to pandas
+    report_df, _ = src.utils.read_csv_filtered(
+        body,
+        src.utils.create_state_predicate('state_abbr', state_abbr),
+        columns=list(REPORT_COLUMN_TYPES),
+        column_types=REPORT_COLUMN_TYPES,
+        skip_rows=1
+    )
+    return report_df
+
+
+def fetch_state_rows(url: str) -> tuple[str | None, pd.DataFrame | None]:
+    # runs in a worker, the body streams through the csv reader + the hash, only the body hash + the state's rows
+    # leave it, weeks biobot didn't publish are a 404, ex holidays
+    response = src.http_client.get(url, cache_ttl=BIOBOT_CACHE_TTL, stream=True)
+    if response.status_code == 404:
+        response.close()
+        return None, None
+    response.raise_for_status()
+
+    with src.utils.HashingReader(src.utils.open_response_body(response)) as body:
+        report_df = read_state_rows(body)
+        return body.sha256.hexdigest(), report_df
+
+
+def get_new_reports(num_reports: int, manifest: dict) -> tuple[dict[str, pd.DataFrame], dict]:
+    # report dates already in the manifest are skipped, as are reports identical to one already ingested
+    # missing weeks are retried, the latest report can 404 until it's published
+    wastewater_run_data = obtain_urls(num_reports)
+    pending = [
+        (expected_date, url)
+        for expected_date, url in zip(wastewater_run_data['expected_dates'], wastewater_run_data['urls'])
+        if manifest['reports'].get(expected_date, {'status': 'missing'})['status'] == 'missing'
+    ]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        fetched = list(executor.map(fetch_state_rows, [url for _, url in pending]))
+
+    ingested_hashes = {x['sha256'] for x in manifest['reports'].values() if x['sha256'] is not None}
+    new_reports = {}
+    new_manifest = {**manifest, 'reports': dict(manifest['reports'])}
+    for (expected_date, url), (content_hash, report_df) in zip(pending, fetched):
+        if content_hash is not None and content_hash not in ingested_hashes:
+            new_reports[expected_date] = report_df
+            ingested_hashes.add(content_hash)
+
+        new_manifest['reports'][expected_date] = {
+            'url': url,
+            'sha256': content_hash,
+            'rows': new_reports[expected_date].shape[0] if expected_date in new_reports else None,
+            'status': 'missing' if content_hash is None else 'ingested' if expected_date in new_reports else 'duplicate'
+        }
+
+    new_manifest['reports'] = dict(sorted(new_manifest['reports'].items()))
+    print(
+        f'biobot: {len(pending)} reports fetched, {len(new_reports)} new, {sum(x is None for x, _ in fetched)} missing, '
+        f'{len(wastewater_run_data["urls"]) - len(pending)} already ingested'
+    )
+    return new_reports, new_manifest
+
+
+def combine_reports(existing_df: pd.DataFrame | None, new_reports: dict[str, pd.DataFrame],
+                    last_ingested_date: str | None) -> pd.DataFrame:
+    # a county + date takes its value from the newest report, so backfilled reports older than the last
+    # ingested one only fill gaps while newer reports replace revised values
+    last_ingested_date = last_ingested_date or ''
+    clean_reports = [(report_date, clean_data(df)) for report_date, df in sorted(new_reports.items())]
+    older = [df for report_date, df in clean_reports if report_date < last_ingested_date]
+    newer = [df for report_date, df in clean_reports if report_date >= last_ingested_date]
+    existing = [] if existing_df is None else [existing_df]
+
+    return (
+        pd.concat(older + existing + newer)
+        .drop_duplicates(subset=['County', 'Date'], keep='last')
+        .sort_values(['County', 'Date'])
+        .reset_index(drop=True)
+    )
+
+
+def get_last_ingested_date(manifest: dict) -> str | None:
+    ingested_dates = [report_date for report_date, x in manifest['reports'].items() if x['status'] == 'ingested']
+    return max(ingested_dates, default=None)
+
+
+# endregion
+
+
 def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     clean_df = (
         df
@@ -67,7 +205,7 @@ def main():
     current_df = src.utils.load_csv('tableau/wastewater/biobot_wastewater.csv')
 
     wastewater_run_data = obtain_urls(1)
-    raw_data = [src.utils.load_csv(url=i, skip_rows=1) for i in wastewater_run_data['urls']]
+    raw_data = [get_report(i) for i in wastewater_run_data['urls']]
     for i, ww_df in enumerate(raw_data):
         check_if_new(ww_df, current_df)
 
@@ -1,34 +1,150 @@
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
 from dotenv import load_dotenv
-from sodapy import Socrata
 
+import src.http_client
 import src.utils
 
-
-def create_client() -> Socrata:
+DATASET_ID = "2ew6-ywp6"
+SODA_URL = "https://data.cdc.gov/resource/{dataset_id}.{file_format}"
+# SODA 2.1 has no $limit ceiling, 50k keeps one page to a few MB
+PAGE_SIZE = 50_000
+WINDOW_DAYS = 28
+MAX_CONCURRENCY = 4
+ROW_ID = ':id'
+
+# typed at parse time, so pages never exist as python dicts
+RAW_SCHEMA = pa.schema([
+    ('county_names', pa.string()),
+    ('sample_location', pa.string()),
+    ('key_plot_id', pa.string()),
+    ('population_served', pa.int32()),
+    ('first_sample_date', pa.string()),
+    ('date_start', pa.string()),
+    ('date_end', pa.string()),
+    ('ptc_15d', pa.float32()),
+    ('percentile', pa.float32()),
+    ('detect_prop_15d', pa.float32()),
+    (ROW_ID, pa.string()),
+])
+
+
+def create_headers() -> dict:
     load_dotenv('.env')
-    client = Socrata(
-        domain="data.cdc.gov",
-        app_token=os.environ.get('CDC_WW_TOKEN')
+    app_token = os.environ.get('CDC_WW_TOKEN')
+    return {} if app_token is None else {'X-App-Token': app_token}
+
+
+def get_max_date(dataset_id: str) -> str:
+    response = src.http_client.get(
+        SODA_URL.format(dataset_id=dataset_id, file_format='json'),
+        params={
+            '$select': 'MAX(date_end) as max_date',
+            '$where': "reporting_jurisdiction = 'Texas'"
+        },
+        headers=create_headers(),
+        cache_ttl=None
+    )
+    response.raise_for_status()
+    return response.json()[0]['max_date']
+
+
+def parse_page(content: bytes) -> pa.Table:
+    return pcsv.read_csv(
+        io.BytesIO(content),
+        convert_options=pcsv.ConvertOptions(
+            column_types=RAW_SCHEMA,
+            include_columns=RAW_SCHEMA.names,
+            strings_can_be_null=True
+        )
     )
-    return client
 
 
-def get_data(client: Socrata, offset: int, dataset_id: str, current_max_date: str) -> list[dict]:
-    results = client.get(
-        dataset_identifier=dataset_id,
-        select="county_names, sample_location, key_plot_id, population_served, first_sample_date, date_start, date_end, ptc_15d, percentile, detect_prop_15d",
-        where=f"reporting_jurisdiction = 'Texas' and date_end> '{current_max_date}'",
-        order="date_start",
-        limit=1000,
-        offset=offset
+def create_page_filter(window: tuple[str, str], cursor: tuple[str, str] | None) -> str:
+    # keyset pagination on (date_start, :id): each page starts after the last row of the one before,
+    # so deep pages cost the same as the first one (unlike $offset)
+    window_start, window_end = window
+    predicates = [
+        "reporting_jurisdiction = 'Texas'",
+        f"date_end > '{window_start}'",
+        f"date_end <= '{window_end}'",
+    ]
+    if cursor is not None:
+        date_start, row_id = cursor
+        predicates.append(f"(date_start > '{date_start}' OR (date_start = '{date_start}' AND {ROW_ID} > '{row_id}'))")
+    return ' and '.join(predicates)
+
+
+def get_page(dataset_id: str, window: tuple[str, str], cursor: tuple[str, str] | None) -> pa.Table:
+    response = src.http_client.get(
+        SODA_URL.format(dataset_id=dataset_id, file_format='csv'),
+        params={
+            '$select': ', '.join(RAW_SCHEMA.names),
+            '$where': create_page_filter(window, cursor),
+            '$order': f'date_start, {ROW_ID}',
+            '$limit': PAGE_SIZE
+        },
+        headers=create_headers(),
+        cache_ttl=None
     )
-    return results
+    response.raise_for_status()
+    return parse_page(response.content)
+
+
+def get_window(dataset_id: str, window: tuple[str, str]) -> list[pd.DataFrame]:
+    # each page is formatted as soon as it's parsed, only one raw page per worker is alive at a time
+    formatted_pages = []
+    cursor = None
+    while True:
+        page = get_page(dataset_id, window, cursor)
+        print(f'Obtained {page.num_rows} rows for date_end {window[0]} - {window[1]}')
+        if page.num_rows > 0:
+            formatted_pages.append(format_raw_data(page.drop([ROW_ID]).to_pandas()))
+
+        if page.num_rows < PAGE_SIZE:
+            return formatted_pages
+        cursor = (page.column('date_start')[-1].as_py(), page.column(ROW_ID)[-1].as_py())
+
+
+def create_windows(current_max_date: str, live_max_date: str, window_days: int = WINDOW_DAYS) -> list[tuple[str, str]]:
+    # (start, end] date_end ranges, paginated independently so they can be fetched concurrently
+    window_start = pd.Timestamp(current_max_date)
+    live_max = pd.Timestamp(live_max_date)
+
+    windows = []
+    while window_start < live_max:
+        window_end = min(window_start + timedelta(days=window_days), live_max)
+        windows.append((window_start.strftime('%Y-%m-%dT%H:%M:%S'), window_end.strftime('%Y-%m-%dT%H:%M:%S')))
+        window_start = window_end
+    return windows
+
+
+def get_new_data(dataset_id: str, current_max_date: str) -> pd.DataFrame | None:
+    # the formatted rows (see format_raw_data) of every page after current_max_date
+    live_max_date = get_max_date(dataset_id)
+    windows = create_windows(current_max_date, live_max_date)
+    if not windows:
+        print(f'No new records found, max date available is {live_max_date}')
+        return None
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        formatted_pages = [x for window_pages in executor.map(lambda x: get_window(dataset_id, x), windows) for x in window_pages]
+    src.http_client.print_stats()
+
+    if not formatted_pages:
+        print(f'No new records found, max date available is {live_max_date}')
+        return None
+
+    return pd.concat(formatted_pages, ignore_index=True)
 
 
-def format_raw_data(df: list) -> pd.DataFrame:
+def format_raw_data(df: pd.DataFrame) -> pd.DataFrame:
     formatted_df = (
         df
         .rename(
@@ -41,7 +157,7 @@ def format_raw_data(df: list) -> pd.DataFrame:
             }
         )
         .drop(columns=['date_start'])
-        .assign(Date=lambda x: pd.to_datetime(x['Date']).dt.date)
+        .assign(Date=lambda x: pd.to_datetime(x['Date']))
         .astype(
             {
                 'population_served': 'int32',
@@ -52,7 +168,8 @@ def format_raw_data(df: list) -> pd.DataFrame:
         )
     )
 
-    formatted_df[['County1', 'County2']] = formatted_df['County'].str.split(',', n=1, expand=True)
+    # a page without any multi county plant still gets both columns
+    formatted_df[['County1', 'County2']] = formatted_df['County'].str.split(',', n=1, expand=True).reindex(columns=[0, 1])
 
     formatted_df = (
         formatted_df
@@ -70,9 +187,8 @@ def format_raw_data(df: list) -> pd.DataFrame:
     return formatted_df
 
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    formatted_df = format_raw_data(df)
-
+def clean_data(formatted_df: pd.DataFrame) -> pd.DataFrame:
+    # pages are formatted as they're fetched, the dedupe + sort run across all of them
     clean_df = (
         formatted_df
         .dropna(
@@ -92,38 +208,10 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def write_raw_results(df: pd.DataFrame) -> None:
-    write_date = df.date_end.max()
+    write_date = df['Date'].max().strftime('%Y-%m-%d')
     src.utils.write_file(df, f'original-sources/historical/wastewater/cdc/cdc_wastewater_raw_{write_date}')
 
 
-def create_offsets(client: object, dataset_id: str, current_max_date: str) -> list[int]:
-    def get_max_date(client: object, dataset_id: str) -> str:
-        response = client.get(
-            dataset_identifier=dataset_id,
-            select="MAX(date_end) as max_date",
-            where=f"reporting_jurisdiction = 'Texas'"
-        )
-        output = response[0]['max_date']
-        return output
-
-    def get_num_records(client: object, dataset_id: str):
-        response = client.get(
-            dataset_identifier=dataset_id,
-            select="COUNT(*) as n ",
-            where=f"reporting_jurisdiction = 'Texas' and date_end > '{current_max_date}'"
-        )
-
-        output = int(response[0]['n'])
-        return output
-
-    live_max_date = get_max_date(client, dataset_id)
-    num_records = get_num_records(client, dataset_id)
-    assert num_records > 0, f'No new records found, max date available is {live_max_date}'
-
-    offsets = [i for i in range(0, num_records, 1000)]
-    return offsets
-
-
 def run_diagnostics(df: pd.DataFrame) -> None:
     check_duplicate_values = (
         df
@@ -147,21 +235,14 @@ def run_diagnostics(df: pd.DataFrame) -> None:
 # region setup --------------------------------------------------------------------------------
 
 def main():
-    client = create_client()
-
-    DATASET_ID = "2ew6-ywp6"
-
     current_df = src.utils.load_csv('tableau/wastewater/cdc_wastewater.csv')
     current_max_date = current_df['Date'].max()
 
     # region pull data --------------------------------------------------------------------------------
-    offsets = create_offsets(client, DATASET_ID, current_max_date)
-    results = [get_data(client, offset, DATASET_ID, current_max_date) for offset in offsets]
-    if results.shape[0] == 0:
-        print('No new records found')
+    results_df = get_new_data(DATASET_ID, current_max_date)
+    if results_df is None:
         return None
 
-    results_df = pd.concat([pd.DataFrame.from_records(i) for i in results])
     write_raw_results(results_df)
     # endregion
 
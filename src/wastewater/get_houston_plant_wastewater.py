@@ -4,10 +4,10 @@ import pandas as pd
 
 import src.utils
 from src.wastewater.houston_wastewater_common import (
-    get_offsets,
+    create_request,
     get_data_manager,
     run_diagnostics,
-    get_max_timestamp
+    get_max_date
 )
 
 
@@ -41,17 +41,20 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
 
 def manage_houston_plant_wastewater() -> pd.DataFrame:
     # region  --------------------------------------------------------------------------------
-    request_url = 'https://services.arcgis.com/lqRTrQp2HrfnJt8U/ArcGIS/rest/services/WWTP_gdb/FeatureServer/0/query?where=1%3D1&outFields=date%2C+corname%2C+vl_est%2C+spline_ww%2C+firstdate%2C+lastdate&sqlFormat=none&f=pjson&token=&resultOffset='
+    layer_url = 'https://services.arcgis.com/lqRTrQp2HrfnJt8U/ArcGIS/rest/services/WWTP_gdb/FeatureServer/0'
+    out_fields = ['date', 'corname', 'vl_est', 'spline_ww', 'firstdate', 'lastdate']
 
-    current_max_date_as_timestamp = get_max_timestamp(None)
+    current_max_date = get_max_date(None)
     # endregion
 
     # region  --------------------------------------------------------------------------------
-    offsets = get_offsets(request_url=request_url, step_interval=2000)
+    where = create_request(layer_url, current_max_date)
     new_dfs_combined = get_data_manager(
-        url=request_url,
-        offsets=offsets,
-        max_date=current_max_date_as_timestamp
+        layer_url=layer_url,
+        where=where,
+        out_fields=out_fields,
+        max_date=current_max_date,
+        page_size=2000
     )
     assert new_dfs_combined.empty is False, 'No data found'
     # endregion
@@ -2,10 +2,10 @@ import pandas as pd
 
 import src.utils
 from src.wastewater.houston_wastewater_common import (
-    get_offsets,
+    create_request,
     get_data_manager,
     run_diagnostics,
-    get_max_timestamp
+    get_max_date
 )
 
 
@@ -42,17 +42,20 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def manage_houston_zip_wastewater() -> pd.DataFrame():
-    request_url = 'https://services.arcgis.com/lqRTrQp2HrfnJt8U/ArcGIS/rest/services/Wastewater_Zip_Case_Analysis/FeatureServer/0//query?where=1%3D1&outFields=date%2C+ZIPCODE%2C+pop%2C+Spline_PR%2C+Spline_WW_Weight%2C+Spline_WW_weight_Percent_10&f=pjson&token=&resultOffset='
+    layer_url = 'https://services.arcgis.com/lqRTrQp2HrfnJt8U/ArcGIS/rest/services/Wastewater_Zip_Case_Analysis/FeatureServer/0'
+    out_fields = ['date', 'ZIPCODE', 'pop', 'Spline_PR', 'Spline_WW_Weight', 'Spline_WW_weight_Percent_10']
 
-    current_max_date_timestamp = get_max_timestamp(None)
+    current_max_date = get_max_date(None)
     # endregion
 
     # region  --------------------------------------------------------------------------------
-    offsets = get_offsets(request_url, step_interval=1000)
+    where = create_request(layer_url, current_max_date)
     new_dfs_combined = get_data_manager(
-        url=request_url,
-        offsets=offsets,
-        max_date=current_max_date_timestamp
+        layer_url=layer_url,
+        where=where,
+        out_fields=out_fields,
+        max_date=current_max_date,
+        page_size=1000
     )
     assert new_dfs_combined.empty is False, 'No data found'
     # endregion
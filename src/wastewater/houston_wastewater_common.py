@@ -1,8 +1,9 @@
 import pandas as pd
-import json
-import requests
 from datetime import datetime as dt
 
+import src.http_client
+from src.arcgis_common import create_incremental_where, get_keyset_pages
+
 
 def run_diagnostics(df: pd.DataFrame, id_col: str) -> None:
     check_if_id_null = df[id_col].isnull().any()
@@ -12,54 +13,38 @@ def run_diagnostics(df: pd.DataFrame, id_col: str) -> None:
     assert not check_if_date_null, 'Null date found'
 
 
-def get_max_timestamp(path: str | None) -> int:
+def get_max_date(path: str | None) -> str:
     if path is None:
-        max_date = dt.strftime(dt(1999, 12, 31), '%Y-%m-%d')
-    else:
-        max_date = pd.read_csv(path)['Date'].max()
-
-    max_date_timestamp = int(dt.strptime(max_date, '%Y-%m-%d').timestamp() * 1000)
-    return max_date_timestamp
+        return dt.strftime(dt(1999, 12, 31), '%Y-%m-%d')
 
+    return pd.read_csv(path)['Date'].max()
 
-def get_offsets(request_url: str, step_interval: int) -> list:
-    def create_num_records_request(url: str) -> str:
-        url_base = url.split('query?')[0]
-        url_count_suffix = 'query?where=1%3D1&returnCountOnly=true&f=pjson'
-        url_out = f'{url_base}{url_count_suffix}'
-        return url_out
 
-    # retrieves value from rest request "count(*) as n"
-    def get_num_records(url) -> int:
-        response = requests.get(url)
-        output = json.loads(response.content)['count']
-        return output
+def create_request(layer_url: str, max_date: str) -> str:
+    where, _ = create_incremental_where(
+        layer_url=layer_url,
+        filter_predicates=[],
+        date_col='date',
+        max_date=max_date,
+        date_format='timestamp_int'
+    )
+    return where
 
-    num_records_request = create_num_records_request(request_url)
-    offsets = list(range(0, get_num_records(num_records_request), step_interval))
-    return offsets
 
-
-def get_data_manager(url: str, offsets: list, max_date: int) -> pd.DataFrame | None:
-    def get_data(url: str, offset: int):
-        url = f'{url}{offset}'
-        request = requests.get(url)
-        response = json.loads(request.content)['features']
-        df = pd.DataFrame.from_records(i['attributes'] for i in response)
-        return df
+def get_data_manager(layer_url: str, where: str, out_fields: list[str], max_date: str,
+                     page_size: int) -> pd.DataFrame | None:
+    # still applied client-side for layers that reject (or ignore) the date predicate
+    max_date_timestamp = int(dt.strptime(max_date, '%Y-%m-%d').timestamp() * 1000)
 
     new_df_list = []
-    for offset in offsets:
-        print(f'Obtaining data with offset: {offset}')
-
-        df = get_data(url, offset)
+    for df in get_keyset_pages(layer_url, where, out_fields, page_size):
+        print(f'Obtained {df.shape[0]} rows')
 
-        # filtering by date/timestamp in rest query wasn't working
-        df_new = (df.query('date > @max_date'))
-        if df_new.empty:
-            break
+        df_new = df[df['date'] > max_date_timestamp]
+        if not df_new.empty:
+            new_df_list.append(df_new)
 
-        new_df_list.append(df_new)
+    src.http_client.print_stats()
 
     if not new_df_list:
         return None
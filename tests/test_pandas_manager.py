@@ -0,0 +1,27 @@
+import pandas as pd
+
+from etl import PandasManager
+from etl.schema_registry import apply_schema
+
+
+def test_in_filter_on_registry_dictionary_column(tmp_path, monkeypatch):
+    # the registry stores county + source as parquet dictionaries, filter values are plain strings
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({
+        'County': ['Harris', 'Bexar', 'Travis', 'Harris'],
+        'Date': pd.to_datetime(['2023-01-01', '2023-01-01', '2023-01-01', '2023-01-02']),
+        'cases_cumulative': [1, 2, 3, 4],
+        'deaths_cumulative': [0, 0, 0, 1],
+        'cases_daily': [1, 2, 3, 3],
+        'deaths_daily': [0, 0, 0, 1],
+        'source': ['dshs', 'dshs', 'dshs', 'dshs'],
+    })
+    PandasManager.write_dataframe_to_disk('tableau', 'county_vitals', False, apply_schema(df, 'county_vitals'))
+
+    filtered_df = PandasManager.read_dataframe_from_disk(
+        'tableau',
+        'county_vitals',
+        filters=[('County', 'in', ['Harris', 'Bexar']), ('source', '==', 'dshs'), ('Date', '>=', '2023-01-01')]
+    )
+
+    assert sorted(filtered_df['County'].astype(str)) == ['Bexar', 'Harris', 'Harris']